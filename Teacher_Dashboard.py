@@ -2,65 +2,39 @@ import io
 import os
 from datetime import datetime
 import threading
-import cv2
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
 from PIL import Image, ImageTk
 import sqlite3
-import openpyxl
 
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 
-from utils.database import get_connection
-from utils.face_recognition_utils import recognize_students
+from utils.database import get_connection, ensure_schema, store_group_photo, upsert_attendance
+from utils import ingest, tracing
+from utils.recognition_worker import BackgroundWorker, JobCancelled, JobTimeout
+from utils.exporter import export_job, progress_text
 
-icon = tk.PhotoImage(file="assets/logo.png")
-self.iconphoto(True, icon)
+RECOGNITION_TIMEOUT_S = 180
 
 # ------------------------- Utility functions -------------------------
-def get_exif_gps(img_path):
+def _fetch_students(prns):
+    """Roster rows (prn, roll_no, name, class, division) for these PRNs."""
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
     try:
-        img = Image.open(img_path)
-        exif_data = img._getexif()
-        if not exif_data:
-            return None, None
-        from PIL.ExifTags import TAGS, GPSTAGS
-        gps_info = {}
-        for tag, value in exif_data.items():
-            decoded = TAGS.get(tag, tag)
-            if decoded == "GPSInfo":
-                for t in value:
-                    sub_decoded = GPSTAGS.get(t, t)
-                    gps_info[sub_decoded] = value[t]
-
-        def convert_to_degrees(val):
-            d = val[0][0] / val[0][1]
-            m = val[1][0] / val[1][1]
-            s = val[2][0] / val[2][1]
-            return d + (m / 60.0) + (s / 3600.0)
-
-        if "GPSLatitude" in gps_info and "GPSLatitudeRef" in gps_info:
-            lat = convert_to_degrees(gps_info["GPSLatitude"])
-            if gps_info["GPSLatitudeRef"] != "N":
-                lat = -lat
-        else:
-            lat = None
-
-        if "GPSLongitude" in gps_info and "GPSLongitudeRef" in gps_info:
-            lon = convert_to_degrees(gps_info["GPSLongitude"])
-            if gps_info["GPSLongitudeRef"] != "E":
-                lon = -lon
-        else:
-            lon = None
-
-        return lat, lon
-    except:
-        return None, None
+        marks = ",".join("?" * len(prns))
+        return [dict(r) for r in conn.execute(
+            f"SELECT prn, roll_no, name, class, division FROM students WHERE prn IN ({marks}) ORDER BY class, division, roll_no",
+            list(prns)
+        ).fetchall()]
+    finally:
+        conn.close()
 
 
 def capture_from_webcam(window_title="Press SPACE to capture, ESC to cancel"):
+    import cv2
     cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
     if not cap.isOpened():
         return None
@@ -97,12 +71,8 @@ def choose_mobile_photo(parent):
     if not path:
         return None, None, None
     try:
-        img = Image.open(path).convert("RGB")
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG")
-        photo_bytes = buf.getvalue()
-        lat, lon = get_exif_gps(path)
-        return photo_bytes, lat, lon
+        # upright JPEG plus EXIF GPS from a single decode; the group clamp keeps back-row faces
+        return ingest.normalize(path, max_side=ingest.GROUP_MAX_SIDE)
     except Exception as e:
         messagebox.showerror("File Error", f"Cannot read selected image:\n{e}")
         return None, None, None
@@ -130,13 +100,22 @@ class TeacherDashboardPage(tk.Frame):
         self.division_var = tb.StringVar()
         self.subject_var = tb.StringVar()
         self.all_present_toggle = tb.BooleanVar(value=False)
+        self.search_all_sections = tb.BooleanVar(value=False)
 
         self.location_var = tb.StringVar(value="Unknown Location")
         self.lat_var = tb.StringVar(value="")
         self.lon_var = tb.StringVar(value="")
 
         self.last_group_photo = None
+        self.last_thumbs = None
         self.tk_photo = None
+        self.status_var = tb.StringVar(value="")
+
+        # background jobs (recognition + DB writes) — callbacks come back on the Tk thread
+        self.worker = BackgroundWorker(self)
+        self.current_job = None
+        # one-time encoding of legacy student photos, on its own thread so snaps don't queue behind it
+        self.backfill_worker = None
 
         # layout
         self._build_ui()
@@ -159,6 +138,21 @@ class TeacherDashboardPage(tk.Frame):
         self.tree.delete(*self.tree.get_children())
         self.photo_label.configure(image="", text="No Photo Uploaded")
         self.tk_photo = None
+        self.status_var.set("")
+
+        if self.backfill_worker is None:
+            self.backfill_worker = BackgroundWorker(self)
+            self.backfill_worker.submit(
+                self._backfill_job,
+                on_progress=self.on_backfill_progress,
+                on_done=self.on_backfill_done,
+                on_error=lambda e: print(f"❌ Encoding backfill failed → {e}"),
+            )
+
+    def on_hide(self):
+        # only the recognition is abandoned; queued attendance writes and exports still run
+        if self.current_job and not self.current_job.finished:
+            self.current_job.cancel()
 
     # ------------------ UI ------------------
     def _build_ui(self):
@@ -273,6 +267,8 @@ class TeacherDashboardPage(tk.Frame):
 
         self.tree.tag_configure("present", foreground="green")
         self.tree.tag_configure("absent", foreground="red")
+        # matched by "Search Other Sections"; kept only if the teacher confirms
+        self.tree.tag_configure("other", background="#fef3c7")
 
         vsb = ttk.Scrollbar(table_card, orient="vertical", command=self.tree.yview)
         self.tree.configure(yscroll=vsb.set)
@@ -291,6 +287,14 @@ class TeacherDashboardPage(tk.Frame):
         self.photo_label = tk.Label(photo_card, text="No Photo Uploaded", bg="white", fg="#6b7280")
         self.photo_label.pack(pady=10, padx=10)
 
+        tk.Label(photo_card, textvariable=self.status_var, bg="white", fg="#0ea5e9",
+                 font=("Segoe UI", 10, "bold"), wraplength=280, justify="left").pack(anchor="w", padx=12)
+
+        self.cancel_btn = tk.Button(photo_card, text="✖ Cancel Recognition", bg="#ef4444", fg="white", bd=0,
+                                    padx=10, pady=6, cursor="hand2", state="disabled",
+                                    command=self.cancel_recognition)
+        self.cancel_btn.pack(anchor="w", padx=12, pady=8)
+
         # Actions card
         actions = tk.Frame(main, bg="white")
         actions.pack(fill="x", padx=18, pady=(0, 16))
@@ -311,6 +315,10 @@ class TeacherDashboardPage(tk.Frame):
                        command=self.toggle_all_present)\
             .pack(side="left", padx=14)
 
+        tk.Checkbutton(row, text="Search Other Sections", variable=self.search_all_sections, bg="white",
+                       fg="#111827", font=("Segoe UI", 10))\
+            .pack(side="left", padx=6)
+
         tk.Button(row, text="💾 Export Excel", bg="#22c55e", fg="white", bd=0, padx=14, pady=8,
                   cursor="hand2", command=self.export_attendance_excel)\
             .pack(side="right", padx=6)
@@ -386,8 +394,7 @@ class TeacherDashboardPage(tk.Frame):
         status = "Present" if val else "Absent"
         tag = "present" if val else "absent"
         for item in self.tree.get_children():
-            self.tree.set(item, "Status", status)
-            self.tree.item(item, tags=(tag,))
+            self._set_status(item, status)
 
     def on_double_click_toggle(self, event=None):
         sel = self.tree.selection()
@@ -395,10 +402,14 @@ class TeacherDashboardPage(tk.Frame):
             return
         item = sel[0]
         cur_status = self.tree.set(item, "Status")
-        new_status = "Absent" if cur_status == "Present" else "Present"
-        tag = "absent" if new_status == "Absent" else "present"
-        self.tree.set(item, "Status", new_status)
-        self.tree.item(item, tags=(tag,))
+        self._set_status(item, "Absent" if cur_status == "Present" else "Present")
+
+    def _set_status(self, item, status):
+        tags = ("present",) if status == "Present" else ("absent",)
+        if self.tree.tag_has("other", item):
+            tags += ("other",)
+        self.tree.set(item, "Status", status)
+        self.tree.item(item, tags=tags)
 
     # ---------------- Recognition Flow ----------------
     def capture_and_recognize(self):
@@ -443,36 +454,149 @@ class TeacherDashboardPage(tk.Frame):
 
     # ---------------- Display & Recognition ----------------
     def process_recognition(self, photo_bytes):
-        # Display photo
-        try:
-            pil_img = Image.open(io.BytesIO(photo_bytes)).convert("RGB")
-            pil_img.thumbnail((280, 280))
-            self.tk_photo = ImageTk.PhotoImage(pil_img)
-            self.photo_label.configure(image=self.tk_photo, text="")
-        except Exception as e:
-            messagebox.showwarning("Display Error", str(e))
+        if self.current_job and not self.current_job.finished:
+            messagebox.showwarning("Busy", "A recognition is already running.")
+            return
+
+        # the preview is rendered on the worker and arrives as the first progress stage
+        self.tk_photo = None
+        self.last_thumbs = None
+        self.photo_label.configure(image="", text="Loading photo...")
+
+        # Everyone starts Absent; matches flip rows to Present as they arrive.
+        # Other-section rows belong to the previous snap.
+        self.tree.delete(*self.tree.tag_has("other"))
+        for item in self.tree.get_children():
+            self._set_status(item, "Absent")
+
+        self.status_var.set("⏳ Recognizing faces...")
+        self.cancel_btn.config(state="normal")
+
+        self.current_job = self.worker.submit(
+            self._recognition_job, photo_bytes,
+            self.class_var.get().strip() or None,
+            self.division_var.get().strip() or None,
+            self.search_all_sections.get(),
+            on_progress=self.on_recognition_progress,
+            on_done=lambda result: self.on_recognition_done(photo_bytes, result),
+            on_error=self.on_recognition_error,
+            timeout=RECOGNITION_TIMEOUT_S
+        )
+
+    @staticmethod
+    def _backfill_job(job):
+        # runs on the worker thread; dlib loads here, after the dashboard is drawn
+        from utils.face_recognition_utils import backfill_face_encodings
+        return backfill_face_encodings(progress=job.report)
+
+    def _recognizing(self):
+        return bool(self.current_job and not self.current_job.finished)
+
+    def on_backfill_progress(self, stage, info):
+        # a running snap owns the status line
+        if not self._recognizing():
+            self.status_var.set(f"⏳ Encoding enrolled photos {info['done']}/{info['total']}...")
+
+    def on_backfill_done(self, stored):
+        if stored and not self._recognizing():
+            self.status_var.set(f"✅ Encoded {stored} enrolled photo(s)")
+
+    @staticmethod
+    def _recognition_job(job, photo_bytes, class_name, division, fallback):
+        # runs on the worker thread — no Tk calls here.
+        # face_recognition/dlib load here on first use, not when the dashboard opens
+        from utils import thumbnails
+        from utils.face_recognition_utils import recognize_students
+
+        def progress(stage, info):
+            # other-section matches are not in the teacher's table; look their rows up here
+            if stage == "matched" and info.get("fallback") and info["prns"]:
+                info = dict(info, students=_fetch_students(info["prns"]))
+            job.report(stage, info)
 
-        # Face Recognition
         try:
-            from utils.face_recognition_utils import reload_known_students
-            reload_known_students(force=True)
-            present_prns, unknown_count = recognize_students(photo_bytes)
+            # rendered in memory only; the thumbnails are cached when the attendance is saved
+            thumbs = thumbnails.render_all(photo_bytes)
+            preview = {"jpeg": thumbs["preview"], "thumbs": thumbs}
         except Exception as e:
-            messagebox.showerror("Recognition Error", str(e))
-            return
+            preview = {"error": str(e)}
+        job.report("preview", preview)
+        return recognize_students(
+            photo_bytes,
+            class_name=class_name,
+            division=division,
+            fallback=fallback,
+            progress=progress
+        )
 
-        present_set = set(str(p).strip() for p in present_prns)
+    def cancel_recognition(self):
+        if self.current_job:
+            self.current_job.cancel()
+            self.status_var.set("Cancelling...")
 
+    def _mark_present(self, prns):
+        present_set = set(str(p).strip() for p in prns)
         matched = 0
         for item in self.tree.get_children():
             tree_prn = str(self.tree.item(item)["values"][0]).strip()
             if tree_prn in present_set:
-                self.tree.set(item, "Status", "Present")
-                self.tree.item(item, tags=("present",))
+                self._set_status(item, "Present")
                 matched += 1
+        return matched
+
+    def _add_other_sections(self, students):
+        """Rows for students matched outside the selected class/division, marked Present."""
+        in_tree = set(str(self.tree.item(item)["values"][0]).strip() for item in self.tree.get_children())
+        for r in students:
+            if r["prn"] in in_tree:
+                continue
+            self.tree.insert(
+                "", "end",
+                values=(r["prn"], r["roll_no"], r["name"], r["class"], r["division"], "Present"),
+                tags=("present", "other")
+            )
+
+    def on_recognition_progress(self, stage, info):
+        if stage == "preview":
+            if info.get("jpeg"):
+                self.last_thumbs = info["thumbs"]
+                self.tk_photo = ImageTk.PhotoImage(Image.open(io.BytesIO(info["jpeg"])))
+                self.photo_label.configure(image=self.tk_photo, text="")
             else:
-                self.tree.set(item, "Status", "Absent")
-                self.tree.item(item, tags=("absent",))
+                self.photo_label.configure(image="", text="Preview unavailable")
+                print(f"⚠ Preview failed → {info.get('error')}")
+        elif stage == "decoded":
+            self.status_var.set("⏳ Detecting faces...")
+        elif stage == "detected":
+            self.status_var.set(f"⏳ {info['faces']} face(s) found, matching...")
+        elif stage == "matched":
+            self._mark_present(info["prns"])
+            if info.get("fallback"):
+                self._add_other_sections(info.get("students", []))
+
+    def on_recognition_done(self, photo_bytes, result):
+        present_prns, unknown_count = result
+        self.cancel_btn.config(state="disabled")
+        if self.current_job and self.current_job.cancelled:
+            # finished after the last checkpoint; nothing was written yet, so honour the cancel
+            self.status_var.set("Recognition cancelled")
+            return
+
+        others = self.tree.tag_has("other")
+        if others:
+            listing = "\n".join(
+                "{0} – {2} ({3}-{4})".format(*self.tree.item(item)["values"]) for item in others
+            )
+            keep = messagebox.askyesno(
+                "Other Sections",
+                f"{len(others)} student(s) from other sections were recognized:\n\n{listing}\n\n"
+                "Mark them present in this attendance?"
+            )
+            if not keep:
+                self.tree.delete(*others)
+
+        matched = sum(1 for item in self.tree.get_children() if self.tree.set(item, "Status") == "Present")
+        self.status_var.set(f"✅ Present: {matched} | Unknown: {unknown_count}")
 
         self.last_group_photo = photo_bytes
 
@@ -484,61 +608,82 @@ class TeacherDashboardPage(tk.Frame):
 
         messagebox.showinfo("Done", f"Recognition completed.\nPresent: {matched}\nUnknown: {unknown_count}")
 
+    def on_recognition_error(self, err):
+        self.cancel_btn.config(state="disabled")
+        if isinstance(err, JobTimeout):
+            self.status_var.set("⌛ Recognition timed out")
+            messagebox.showerror("Recognition Timeout", "Recognition took too long and was stopped.")
+        elif isinstance(err, JobCancelled):
+            self.status_var.set("Recognition cancelled")
+        else:
+            self.status_var.set("❌ Recognition failed")
+            messagebox.showerror("Recognition Error", str(err))
+
     # ---------------- Save Attendance DB ----------------
     def save_to_db(self, photo_bytes):
         if not self.subject_var.get().strip() or not self.tree.get_children():
             return
 
-        subject = self.subject_var.get().strip()
-
-        conn = get_connection()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-
+        # Read everything from Tk here; the write itself runs on the worker thread
+        rows = [
+            (str(self.tree.item(item)["values"][0]).strip(), self.tree.set(item, "Status"))
+            for item in self.tree.get_children()
+        ]
         try:
-            cur.execute("SELECT id FROM subjects WHERE name=?", (subject,))
-            row = cur.fetchone()
-            if not row:
-                messagebox.showerror("DB Error", "Selected subject not found in database.")
-                return
-
-            subject_id = row["id"]
-            date = datetime.now().strftime("%Y-%m-%d")
-            time_now = datetime.now().strftime("%H:%M:%S")
-            location = self.location_var.get().strip()
             latitude = float(self.lat_var.get()) if self.lat_var.get() else None
             longitude = float(self.lon_var.get()) if self.lon_var.get() else None
+        except ValueError:
+            latitude = longitude = None
+
+        self.worker.submit(
+            self._write_attendance, rows, self.subject_var.get().strip(), self.teacher_id,
+            self.class_var.get().strip(), self.division_var.get().strip(), photo_bytes, self.last_thumbs,
+            self.location_var.get().strip(), latitude, longitude,
+            on_error=lambda e: messagebox.showerror("DB Error", f"Saving attendance failed:\n{e}")
+        )
 
-            for item in self.tree.get_children():
-                prn = str(self.tree.item(item)["values"][0]).strip()
-                status = self.tree.set(item, "Status")
-
-                # UNIQUE(prn, subject_id, date) → update if exists else insert
-                cur.execute(
-                    "SELECT id FROM attendance WHERE prn=? AND subject_id=? AND date=?",
-                    (prn, subject_id, date)
-                )
-                existing = cur.fetchone()
-
-                if existing:
-                    cur.execute("""
-                        UPDATE attendance
-                        SET teacher_id=?, time=?, status=?, photo=?, location=?, latitude=?, longitude=?
-                        WHERE id=?
-                    """, (self.teacher_id, time_now, status, photo_bytes, location, latitude, longitude, existing["id"]))
-                else:
-                    cur.execute("""
-                        INSERT INTO attendance(prn, subject_id, teacher_id, date, time, status, photo, location, latitude, longitude)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (prn, subject_id, self.teacher_id, date, time_now, status, photo_bytes, location, latitude, longitude))
-
-            conn.commit()
-
-        except Exception as e:
-            conn.rollback()
-            messagebox.showerror("DB Error", f"Saving attendance failed:\n{e}")
-        finally:
-            conn.close()
+    @staticmethod
+    def _write_attendance(job, rows, subject, teacher_id, class_name, division, photo_bytes, thumbs,
+                          location, latitude, longitude):
+        """One transaction: the group photo is stored once, all rows go in with a single executemany."""
+        with tracing.trace("save", class_name=class_name, division=division, rows=len(rows)), \
+                tracing.span("db_write"):
+            ensure_schema()
+            conn = get_connection()
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+
+            try:
+                cur.execute("SELECT id FROM subjects WHERE name=?", (subject,))
+                row = cur.fetchone()
+                if not row:
+                    raise ValueError("Selected subject not found in database.")
+
+                subject_id = row["id"]
+                now = datetime.now()
+                date = now.strftime("%Y-%m-%d")
+                time_now = now.strftime("%H:%M:%S")
+
+                # IMMEDIATE takes the write lock up front (waits on busy_timeout) so the
+                # transaction can't fail half-way when the Tk thread is also writing
+                cur.execute("BEGIN IMMEDIATE")
+
+                # Same image saved again → same group_photos row, nothing new written
+                group_photo_id = None
+                if photo_bytes:
+                    group_photo_id = store_group_photo(cur, photo_bytes, teacher_id, subject_id, class_name, division,
+                                                       date, time_now, location, latitude, longitude,
+                                                       thumbs=thumbs)
+
+                upsert_attendance(cur, rows, subject_id, teacher_id, date, time_now, group_photo_id,
+                                  location, latitude, longitude)
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
 
     # ---------------- Export Attendance Excel ----------------
     def export_attendance_excel(self):
@@ -546,19 +691,21 @@ class TeacherDashboardPage(tk.Frame):
             messagebox.showwarning("No Data", "No attendance data to export.")
             return
 
-        wb = openpyxl.Workbook()
-        sheet = wb.active
-        sheet.title = "Attendance"
-
         headers = ["PRN", "Roll No", "Name", "Class", "Division", "Status"]
-        sheet.append(headers)
-
-        for item in self.tree.get_children():
-            row = self.tree.item(item)["values"]
-            sheet.append(row)
+        # The table holds the live (possibly unsaved) statuses, so snapshot it here on the Tk thread
+        rows = [self.tree.item(item)["values"] for item in self.tree.get_children()]
 
         filename = f"attendance_{datetime.now().strftime('%Y_%m_%d')}.xlsx"
         downloads_path = os.path.join(os.path.expanduser("~"), "Downloads", filename)
 
-        wb.save(downloads_path)
-        messagebox.showinfo("Success", f"Attendance saved in Excel:\n{downloads_path}")
+        self.worker.submit(
+            export_job, downloads_path, headers, rows=rows, sheet_title="Attendance",
+            on_progress=lambda stage, info: self.status_var.set(progress_text(info)),
+            on_done=self.on_export_done,
+            on_error=lambda e: messagebox.showerror("Export Error", str(e)),
+        )
+
+    def on_export_done(self, result):
+        path, rows = result
+        self.status_var.set(f"✅ Exported {rows} row(s)")
+        messagebox.showinfo("Success", f"Attendance saved in Excel:\n{path}")
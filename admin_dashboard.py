@@ -3,19 +3,13 @@ from tkinter import messagebox
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 
-from utils.database import get_connection
-from student_module import StudentModule
-from teacher_module import TeacherModule
-from subject_module import SubjectModule
-from attendance_module import AttendanceModule
+from utils.database import get_connection, ensure_schema
 
 
 class AdminDashboardPage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent, bg="#F5F7FA")
         self.controller = controller
-        icon = tk.PhotoImage(file="assets/logo.png")
-        self.iconphoto(True, icon)
 
         self.active_btn = None
         self.menu_buttons = []
@@ -68,6 +62,7 @@ class AdminDashboardPage(tk.Frame):
             ("📘   Subjects", self.show_subjects_page),
             ("🕒   Attendance", self.show_attendance_page),
             ("📊   Reports", self.show_reports_page),
+            ("⏱   Performance", self.show_performance_page),
             ("⚙️   Settings", self.show_settings_page),
             ("🚪   Logout", self.logout),
         ]
@@ -208,19 +203,23 @@ class AdminDashboardPage(tk.Frame):
     # -------------------- MODULE PAGES --------------------
     def show_students_page(self):
         self.clear_content()
+        from student_module import StudentModule
         StudentModule(self.content).pack(fill="both", expand=True)
 
     def show_teachers_page(self):
         self.clear_content()
+        from teacher_module import TeacherModule
         TeacherModule(self.content).pack(fill="both", expand=True)
 
     def show_subjects_page(self):
         self.clear_content()
+        from subject_module import SubjectModule
         module = SubjectModule(self.content)
         module.frame.pack(fill="both", expand=True)
 
     def show_attendance_page(self):
         self.clear_content()
+        from attendance_module import AttendanceModule
         AttendanceModule(self.content).pack(fill="both", expand=True)
 
     def show_reports_page(self):
@@ -228,6 +227,11 @@ class AdminDashboardPage(tk.Frame):
         from reports_module import ReportsModule
         ReportsModule(self.content).get_frame().pack(fill="both", expand=True)
 
+    def show_performance_page(self):
+        self.clear_content()
+        from performance_module import PerformanceModule
+        PerformanceModule(self.content).get_frame().pack(fill="both", expand=True)
+
     def show_settings_page(self):
         self.clear_content()
         from settings_module import SettingsModule
@@ -254,13 +258,13 @@ class AdminDashboardPage(tk.Frame):
 
     def get_attendance_summary(self):
         try:
+            ensure_schema()
             conn = get_connection()
             cur = conn.cursor()
             cur.execute("""
-                SELECT date,
-                       SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END) as present_count
-                FROM attendance
-                GROUP BY date
+                SELECT date, present as present_count
+                FROM attendance_daily
+                WHERE total > 0
                 ORDER BY date DESC
                 LIMIT 7
             """)
@@ -2,6 +2,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from utils.database import get_connection
+from utils.paged_table import PagedTreeview
 from datetime import datetime
 
 class AttendanceModule:
@@ -40,13 +41,14 @@ class AttendanceModule:
 
         # Table
         cols = ("id","prn","roll_no","name","subject_id","teacher_id","date","time","status","remarks")
-        self.tree = ttk.Treeview(self.frame, columns=cols, show="headings", height=14)
+        self.table = PagedTreeview(self.frame, cols, height=14)
+        self.tree = self.table.tree
 
         for c in cols:
             self.tree.heading(c, text=c.replace("_"," ").title())
             self.tree.column(c, anchor="center", width=120)
 
-        self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.table.pack(fill="both", expand=True, padx=10, pady=10)
         self.tree.bind("<Double-1>", self.on_double_click)
 
         # Load initial records
@@ -55,35 +57,17 @@ class AttendanceModule:
     # ----------------- LOAD RECORDS -----------------
     def load_records(self):
         date = self.date_var.get().strip()
-        for r in self.tree.get_children():
-            self.tree.delete(r)
-
-        conn = get_connection()
-        cur = conn.cursor()
         try:
-            cur.execute("""
-                SELECT * FROM attendance WHERE date=?
-                ORDER BY prn
-            """, (date,))
-            rows = cur.fetchall()
-            for row in rows:
-                r = dict(row)  # convert sqlite3.Row -> dict
-                self.tree.insert("", "end", values=(
-                    r.get("id"),
-                    r.get("prn"),
-                    r.get("roll_no", ""),
-                    r.get("name", ""),
-                    r.get("subject_id"),
-                    r.get("teacher_id"),
-                    r.get("date"),
-                    r.get("time"),
-                    r.get("status"),
-                    r.get("remarks")
-                ))
+            self.table.set_query("""
+                SELECT a.id, a.prn, COALESCE(s.roll_no, '') as roll_no, COALESCE(s.name, '') as name,
+                       a.subject_id, a.teacher_id, a.date, a.time, a.status, a.remarks
+                FROM attendance a
+                LEFT JOIN students s ON s.prn = a.prn
+                WHERE a.date=?
+            """, (date,), keys=("prn", "id"), count_sql="SELECT COUNT(*) FROM attendance WHERE date=?")
         except Exception as e:
+            self.table.clear()
             messagebox.showerror("Error", str(e))
-        finally:
-            conn.close()
 
     # ----------------- MARK ATTENDANCE -----------------
     def open_mark_dialog(self):
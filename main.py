@@ -1,19 +1,24 @@
+import time
+_T0 = time.perf_counter()
+
+import importlib
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
-import cv2
 import os
 
 icon_path = os.path.join("assets", "logo.png")
-icon = tk.PhotoImage(file=icon_path)
-self.iconphoto(True, icon)
-# ✅ Import routed Frame pages (NOT Tk windows)
-from admin_login import AdminLoginPage
-from teacher_login import TeacherLoginPage
-from login_student import StudentLoginPage
-from admin_dashboard import AdminDashboardPage
-from Teacher_Dashboard import TeacherDashboardPage
-from student_dashboard import StudentDashboardPage
+
+# ✅ Routed Frame pages (NOT Tk windows), imported and built on first navigate.
+# Dashboards pull in matplotlib, ttkbootstrap, OpenCV and dlib, so none of that
+# is loaded before the role-selection screen is drawn.
+LAZY_PAGES = {
+    "AdminLoginPage": "admin_login",
+    "TeacherLoginPage": "teacher_login",
+    "StudentLoginPage": "login_student",
+    "AdminDashboardPage": "admin_dashboard",
+    "TeacherDashboardPage": "Teacher_Dashboard",
+    "StudentDashboardPage": "student_dashboard",
+}
 
 
 class SmartSnapApp(tk.Tk):
@@ -38,39 +43,61 @@ class SmartSnapApp(tk.Tk):
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
 
+        try:
+            self.icon = tk.PhotoImage(file=icon_path)
+            self.iconphoto(True, self.icon)
+        except tk.TclError:
+            pass
+
         self.frames = {}
+        # page name → class or module name; built on first navigate
+        self.routes = {}
 
         # ✅ Register pages
         self.register(HomePage)
-        self.register(AdminLoginPage)
-        self.register(TeacherLoginPage)
-        self.register(StudentLoginPage)
-        self.register(AdminDashboardPage)
-        self.register(TeacherDashboardPage)
-        self.register(StudentDashboardPage)
+        for name, module in LAZY_PAGES.items():
+            self.register(name, module)
 
         # Start route
         self.navigate("HomePage", add_to_history=False)
 
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
-    def register(self, PageClass):
-        name = PageClass.__name__
-        frame = PageClass(self.container, self)
-        self.frames[name] = frame
+    def register(self, page, module=None):
+        """register(PageClass) or register("PageName", "module") for a lazily imported page."""
+        if isinstance(page, str):
+            self.routes[page] = module
+        else:
+            self.routes[page.__name__] = page
+
+    def _build_page(self, page_name):
+        t0 = time.perf_counter()
+        page = self.routes[page_name]
+        if isinstance(page, str):
+            page = getattr(importlib.import_module(page), page_name)
+        frame = page(self.container, self)
         frame.grid(row=0, column=0, sticky="nsew")
+        self.frames[page_name] = frame
+        print(f"🧱 Built {page_name} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return frame
 
     def navigate(self, page_name: str, add_to_history=True):
         print("➡ Navigating to:", page_name)
-        print("📄 Registered pages:", list(self.frames.keys()))
 
-        if page_name not in self.frames:
+        if page_name not in self.routes:
             messagebox.showerror(
                 "Routing Error",
                 f"Page not registered: {page_name}"
             )
             return
 
+        if page_name not in self.frames:
+            try:
+                self._build_page(page_name)
+            except Exception as e:
+                messagebox.showerror("Page Error", f"Could not open {page_name}:\n{e}")
+                return
+
         if self.current_page:
             cur = self.frames[self.current_page]
             if hasattr(cur, "on_hide"):
@@ -106,7 +133,7 @@ class HomePage(tk.Frame):
 
         # ---------- VIDEO ----------
         self.video_path = "background.mp4"
-        self.cap = None
+        self.video = None
         self.running = False
 
         self.bg_label = tk.Label(self)
@@ -157,28 +184,30 @@ class HomePage(tk.Frame):
 
     # Called when page becomes active
     def on_show(self):
+        self.running = True
+        # Let the buttons paint first; OpenCV is imported and the video opened afterwards
+        self.after(50, self.start_video)
+
+    def start_video(self):
+        if not self.running or self.video:
+            return
         if not os.path.exists(self.video_path):
             messagebox.showerror("Error", f"Could not find: {self.video_path}")
             return
 
-        self.cap = cv2.VideoCapture(self.video_path)
-        if not self.cap.isOpened():
+        # decoding/scaling runs on a background thread, see utils/video_background.py
+        from utils.video_background import VideoBackground
+        self.video = VideoBackground(self.bg_label, self.video_path)
+        if not self.video.start():
+            self.video = None
             messagebox.showerror("Error", "Could not load background video!")
-            self.cap = None
-            return
-
-        self.running = True
-        self.play_video()
 
     # Called when leaving the page
     def on_hide(self):
         self.running = False
-        try:
-            if self.cap and self.cap.isOpened():
-                self.cap.release()
-        except:
-            pass
-        self.cap = None
+        if self.video:
+            self.video.stop()
+            self.video = None
 
     def create_role_button(self, text, color, command):
         btn = tk.Label(
@@ -207,37 +236,22 @@ class HomePage(tk.Frame):
         b = int(b + (255 - b) * factor)
         return f"#{r:02x}{g:02x}{b:02x}"
 
-    def play_video(self):
-        if not self.running or not self.cap:
-            return
-
-        ret, frame = self.cap.read()
-        if not ret:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.cap.read()
-            if not ret:
-                self.after(50, self.play_video)
-                return
-
-        w = self.winfo_width()
-        h = self.winfo_height()
-
-        if w < 50 or h < 50:
-            self.after(50, self.play_video)
-            return
-
-        frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_LINEAR)
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        img = Image.fromarray(frame)
-        imgtk = ImageTk.PhotoImage(img)
-
-        self.bg_label.imgtk = imgtk
-        self.bg_label.configure(image=imgtk)
 
-        self.after(33, self.play_video)
+def report_startup(app, t_imports, t_window):
+    """Print how long it took until the home screen was actually on screen."""
+    app.update_idletasks()
+    t_shown = time.perf_counter()
+    print(
+        f"🚀 Startup: imports {(t_imports - _T0) * 1000:.0f} ms | "
+        f"window {(t_window - t_imports) * 1000:.0f} ms | "
+        f"first paint {(t_shown - t_window) * 1000:.0f} ms | "
+        f"total {(t_shown - _T0) * 1000:.0f} ms"
+    )
 
 
 if __name__ == "__main__":
+    t_imports = time.perf_counter()
     app = SmartSnapApp()
+    t_window = time.perf_counter()
+    app.after_idle(report_startup, app, t_imports, t_window)
     app.mainloop()
@@ -0,0 +1,77 @@
+# performance_module.py
+import time
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+from utils import tracing
+
+STAGE_COLUMNS = ("decode", "detect", "encode", "match", "db_write")
+
+
+class PerformanceModule:
+    """Recent snap / save latencies from the recognition traces (utils/tracing)."""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.frame = tk.Frame(parent, bg="white")
+        self.build_ui()
+
+    def get_frame(self):
+        return self.frame
+
+    def build_ui(self):
+        tk.Label(self.frame, text="⏱ Recognition Performance", font=("Segoe UI", 16, "bold"), bg="white").pack(anchor="w", pady=10, padx=10)
+
+        bar = tk.Frame(self.frame, bg="white")
+        bar.pack(fill="x", padx=10, pady=5)
+
+        tk.Label(bar, text="Show:", bg="white").pack(side="left", padx=5)
+        self.kind_var = tk.StringVar(value="snap")
+        ttk.Combobox(bar, textvariable=self.kind_var, values=["snap", "save", "load", "all"],
+                     state="readonly", width=8).pack(side="left")
+        tk.Button(bar, text="Refresh", command=self.load_traces).pack(side="left", padx=10)
+
+        self.summary_var = tk.StringVar(value="")
+        tk.Label(bar, textvariable=self.summary_var, bg="white", fg="#0ea5e9").pack(side="left", padx=10)
+
+        cols = ("time", "trace", "section", "faces", "matched", "unknown") + STAGE_COLUMNS + ("total",)
+        self.tree = ttk.Treeview(self.frame, columns=cols, show="headings", height=18)
+        for c in cols:
+            self.tree.heading(c, text=c.replace("_", " ").title() + (" (ms)" if c in STAGE_COLUMNS + ("total",) else ""))
+            self.tree.column(c, anchor="center", width=150 if c == "time" else 90)
+        vsb = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=vsb.set)
+        vsb.pack(side="right", fill="y", pady=10)
+        self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.load_traces()
+
+    def load_traces(self):
+        kind = self.kind_var.get()
+        records = tracing.recent(200, None if kind == "all" else kind)
+
+        self.tree.delete(*self.tree.get_children())
+        for r in records:
+            attrs, counters, spans = r.get("attrs", {}), r.get("counters", {}), r.get("spans", {})
+            section = "-".join(str(attrs[k]) for k in ("class_name", "division") if attrs.get(k)) or "All"
+            self.tree.insert("", "end", values=(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["ts"])),
+                r["trace"] + (" ❌" if r.get("error") else ""),
+                section,
+                counters.get("faces", ""),
+                counters.get("matched", ""),
+                counters.get("unknown", ""),
+                *[f"{spans[s]:.0f}" if s in spans else "" for s in STAGE_COLUMNS],
+                f"{r['ms']:.0f}",
+            ))
+
+        totals = [r["ms"] for r in records if not r.get("error")]
+        if totals:
+            self.summary_var.set(
+                f"{len(totals)} record(s) | p50 {np.percentile(totals, 50):.0f} ms | "
+                f"p95 {np.percentile(totals, 95):.0f} ms"
+            )
+        else:
+            self.summary_var.set("No traces recorded yet")
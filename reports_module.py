@@ -1,9 +1,11 @@
 # reports_module.py
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from utils.database import get_connection
+from tkinter import messagebox, filedialog
+from utils.paged_table import PagedTreeview
 from datetime import datetime
-import pandas as pd
+from utils.exporter import export_job, progress_text
+from utils.recognition_worker import BackgroundWorker
 
 class ReportsModule:
     def __init__(self, parent):
@@ -32,66 +34,99 @@ class ReportsModule:
 
         tk.Button(filt, text="Load Report", command=self.load_report).pack(side="left", padx=10)
         tk.Button(filt, text="Export to Excel", command=self.export_excel).pack(side="left", padx=10)
+        tk.Button(filt, text="Analytics Export (Parquet)", command=self.export_analytics).pack(side="left", padx=10)
+        self.export_var = tk.StringVar(value="")
+        tk.Label(filt, textvariable=self.export_var, bg="white", fg="#0ea5e9").pack(side="left", padx=5)
+        self.worker = None
 
         # Table
         cols = ("prn","roll_no","name","subject","teacher","date","status","remarks")
-        self.tree = ttk.Treeview(self.frame, columns=cols, show="headings", height=18)
+        self.table = PagedTreeview(self.frame, cols, height=18)
+        self.tree = self.table.tree
         for c in cols:
             self.tree.heading(c, text=c.replace("_"," ").title())
             self.tree.column(c, anchor="center", width=120)
-        self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.table.pack(fill="both", expand=True, padx=10, pady=10)
 
         self.load_report()
 
-    def load_report(self):
-        for r in self.tree.get_children():
-            self.tree.delete(r)
+    REPORT_SQL = """
+        SELECT a.prn, s.roll_no, s.name, sub.name as subject, t.name as teacher, a.date, a.status, a.remarks,
+               COALESCE(s.roll_no, '') as roll_key, a.id as id
+        FROM attendance a
+        LEFT JOIN students s ON a.prn = s.prn
+        LEFT JOIN subjects sub ON a.subject_id = sub.id
+        LEFT JOIN teachers t ON a.teacher_id = t.id
+        WHERE a.date BETWEEN ? AND ?
+    """
 
+    def load_report(self):
         from_date = self.from_var.get().strip()
         to_date = self.to_var.get().strip()
 
-        conn = get_connection()
-        cur = conn.cursor()
+        # Paged: only the visible window of rows is fetched (keyset on date, roll no, id)
         try:
-            cur.execute("""
-                SELECT a.prn, s.roll_no, s.name, sub.name as subject, t.name as teacher, a.date, a.status, a.remarks
-                FROM attendance a
-                LEFT JOIN students s ON a.prn = s.prn
-                LEFT JOIN subjects sub ON a.subject_id = sub.id
-                LEFT JOIN teachers t ON a.teacher_id = t.id
-                WHERE a.date BETWEEN ? AND ?
-                ORDER BY a.date, s.roll_no
-            """, (from_date, to_date))
-            rows = cur.fetchall()
-            for r in rows:
-                self.tree.insert("", "end", values=(
-                    r["prn"], r["roll_no"], r["name"], r["subject"], r["teacher"], r["date"], r["status"], r["remarks"]
-                ))
+            self.table.set_query(
+                self.REPORT_SQL, (from_date, to_date), keys=("date", "roll_key", "id"),
+                count_sql="SELECT COUNT(*) FROM attendance WHERE date BETWEEN ? AND ?",
+            )
         except Exception as e:
+            self.table.clear()
             messagebox.showerror("Error", str(e))
-        finally:
-            conn.close()
 
     def export_excel(self):
-        if not self.tree.get_children():
-            messagebox.showwarning("No Data", "No report data to export!")
-            return
+        from_date = self.from_var.get().strip()
+        to_date = self.to_var.get().strip()
 
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx")],
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")],
             title="Save Report"
         )
         if not file_path:
             return
 
-        data = []
-        for iid in self.tree.get_children():
-            data.append(self.tree.item(iid)["values"])
+        # Streamed from the database on a background thread, not from the (paged) table
+        sql = f"""
+            SELECT prn, roll_no, name, subject, teacher, date, status, remarks
+            FROM ({self.REPORT_SQL}) ORDER BY date, roll_key, id
+        """
+        if self.worker is None:
+            self.worker = BackgroundWorker(self.frame)
+        self.export_var.set("⏳ Exporting...")
+        self.worker.submit(
+            export_job, file_path, ["PRN","Roll No","Name","Subject","Teacher","Date","Status","Remarks"],
+            sql=sql, params=(from_date, to_date), sheet_title="Report",
+            on_progress=lambda stage, info: self.export_var.set(progress_text(info)),
+            on_done=self.on_export_done,
+            on_error=self.on_export_error,
+        )
 
-        df = pd.DataFrame(data, columns=["PRN","Roll No","Name","Subject","Teacher","Date","Status","Remarks"])
-        try:
-            df.to_excel(file_path, index=False)
-            messagebox.showinfo("Exported", f"Report exported to {file_path}")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+    def export_analytics(self):
+        """Append attendance created since the last run to the partitioned Parquet dataset."""
+        from utils.analytics_export import export_parquet_job, export_dir
+
+        if self.worker is None:
+            self.worker = BackgroundWorker(self.frame)
+        self.export_var.set("⏳ Exporting...")
+        self.worker.submit(
+            export_parquet_job,
+            on_progress=lambda stage, info: self.export_var.set(progress_text(info)),
+            on_done=lambda rows: (self.export_var.set(""),
+                                  messagebox.showinfo("Exported", f"{rows:,} new row(s) written to {export_dir()}")),
+            on_error=self.on_export_error,
+        )
+
+    def on_export_done(self, result):
+        path, rows = result
+        self.export_var.set("")
+        if not rows:
+            messagebox.showwarning("No Data", "No report data to export!")
+            try: os.remove(path)
+            except: pass
+            return
+        messagebox.showinfo("Exported", f"{rows:,} rows exported to {path}")
+
+    def on_export_error(self, err):
+        self.export_var.set("")
+        messagebox.showerror("Error", str(err))
@@ -6,7 +6,8 @@ import io
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-from utils.database import get_connection
+from utils.database import get_connection, ensure_schema
+from utils import image_store, thumbnails
 
 
 class StudentDashboardPage(tk.Frame):
@@ -21,8 +22,6 @@ class StudentDashboardPage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent, bg="#0f1720")
         self.controller = controller
-        icon = tk.PhotoImage(file="assets/logo.png")
-        dash.iconphoto(True, icon)
 
         # ---- THEME ----
         self.FONT_BOLD = ("Segoe UI", 14, "bold")
@@ -184,7 +183,8 @@ class StudentDashboardPage(tk.Frame):
         try:
             conn = get_connection()
             cur = conn.cursor()
-            cur.execute("SELECT name, photo FROM students WHERE prn=?", (prn,))
+            # only the photo's key: the avatar comes from the thumbnail cache
+            cur.execute("SELECT name, photo_key FROM students WHERE prn=?", (prn,))
             res = cur.fetchone()
             conn.close()
             return res
@@ -193,12 +193,13 @@ class StudentDashboardPage(tk.Frame):
 
     def attendance_totals(self, prn):
         try:
+            ensure_schema()
             conn = get_connection()
             cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM attendance WHERE prn=?", (prn,))
-            total = cur.fetchone()[0] or 0
-            cur.execute("SELECT COUNT(*) FROM attendance WHERE prn=? AND status='Present'", (prn,))
-            present = cur.fetchone()[0] or 0
+            # rollup maintained by triggers on attendance (see utils/database.py)
+            cur.execute("SELECT SUM(total), SUM(present) FROM attendance_student_subject WHERE prn=?", (prn,))
+            total, present = cur.fetchone()
+            total, present = total or 0, present or 0
             conn.close()
             absent = total - present
             return total, present, absent
@@ -207,15 +208,15 @@ class StudentDashboardPage(tk.Frame):
 
     def subject_stats(self, prn):
         try:
+            ensure_schema()
             conn = get_connection()
             cur = conn.cursor()
             cur.execute("""
-                SELECT s.name, COUNT(a.id) AS total,
-                       SUM(CASE WHEN a.status='Present' THEN 1 ELSE 0 END) AS present
-                FROM attendance a
-                JOIN subjects s ON a.subject_id = s.id
-                WHERE a.prn=?
-                GROUP BY a.subject_id
+                SELECT s.name, r.total, r.present
+                FROM attendance_student_subject r
+                JOIN subjects s ON r.subject_id = s.id
+                WHERE r.prn=? AND r.total > 0
+                ORDER BY r.subject_id
             """, (prn,))
             rows = cur.fetchall()
             conn.close()
@@ -264,7 +265,12 @@ class StudentDashboardPage(tk.Frame):
 
         # ------- fetch student -------
         std = self.fetch_student(prn)
-        student_name, photo_data = (std["name"], std["photo"]) if std else (prn, None)
+        student_name = std["name"] if std else prn
+        try:
+            photo_data = thumbnails.load(
+                std["photo_key"], full=lambda: image_store.load_student_photo(prn)) if std else None
+        except Exception:
+            photo_data = None
 
         # -------- GRID LAYOUT --------
         left = tk.Frame(self.content, bg=self.PANEL_BG)
@@ -287,7 +293,7 @@ class StudentDashboardPage(tk.Frame):
 
         if photo_data:
             try:
-                img = Image.open(io.BytesIO(photo_data)).resize((120, 120))
+                img = Image.open(io.BytesIO(photo_data))
                 photo = ImageTk.PhotoImage(img)
                 tk.Label(photo_box, image=photo, bg=self.CARD_BG).pack()
                 prof_card.image = photo
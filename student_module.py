@@ -5,37 +5,33 @@ from PIL import Image, ImageTk
 import io
 import hashlib
 import os
-import pandas as pd
-from utils.database import get_connection
+from utils.database import get_connection, ensure_schema
+from utils import image_store, ingest, thumbnails
+from utils.paged_table import PagedTreeview
+from utils.exporter import export_job, progress_text
+from utils.recognition_worker import BackgroundWorker
 
 # ---------- Helpers ----------
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
-def ensure_photo_column():
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(students)")
-        cols = [r[1] for r in cur.fetchall()]
-        if "photo" not in cols:
-            cur.execute("ALTER TABLE students ADD COLUMN photo BLOB")
-            conn.commit()
-        conn.close()
-    except:
-        try: conn.close()
-        except: pass
-
-ensure_photo_column()
+# students.photo / face_encodings etc. are created by the migration runner
+try:
+    ensure_schema()
+except Exception as e:
+    print(f"⚠ Schema migration failed → {e}")
 
 # ---------- Student Module ----------
 class StudentModule(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.pack(fill="both", expand=True)
-        self.photo_blob = None
+        self.photo_blob = None        # newly uploaded photo only; stored photos are never loaded here
+        self.preview_jpeg = None
+        self.extra_photos = []
         self.preview_img = None
         self.selected_prn_for_edit = None
+        self.worker = None
         self.create_widgets()
         self.load_students()
 
@@ -71,14 +67,12 @@ class StudentModule(ttk.Frame):
         table_frame = tk.Frame(container, bg="#F6F8FA")
         table_frame.pack(fill="both", expand=True, padx=10, pady=8)
         cols = ("prn", "roll_no", "name", "class", "division", "email")
-        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings", selectmode="browse")
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
-        vsb.pack(side="right", fill="y")
+        self.table = PagedTreeview(table_frame, cols, bg="#F6F8FA", selectmode="browse")
+        self.tree = self.table.tree
         for c in cols:
             self.tree.heading(c, text=c.replace("_", " ").title())
             self.tree.column(c, width=120, anchor="center")
-        self.tree.pack(fill="both", expand=True)
+        self.table.pack(fill="both", expand=True)
         self.tree.bind("<Double-1>", lambda e: self.open_edit_window())
 
         # Bottom buttons
@@ -88,6 +82,8 @@ class StudentModule(ttk.Frame):
                   command=self.open_edit_window).pack(side="left", padx=6)
         tk.Button(action_frame, text="🗑 Delete", bg="#e53e3e", fg="white", relief="flat",
                   command=self.delete_student).pack(side="left", padx=6)
+        self.status_var = tk.StringVar(value="")
+        tk.Label(action_frame, textvariable=self.status_var, bg="#F6F8FA", fg="#0b6e7f").pack(side="right", padx=6)
 
     # ---------- DB Helper ----------
     def run_query(self, query, params=(), fetch=True):
@@ -106,44 +102,32 @@ class StudentModule(ttk.Frame):
             return []
 
     # ---------- Load / Search ----------
-    def load_students(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        conn = get_connection()
-        cur = conn.cursor()
+    STUDENT_SQL = "SELECT prn, roll_no, name, class, division, email FROM students"
 
-        try:
-            cur.execute("SELECT prn, roll_no, name, class, division, email FROM students ORDER BY roll_no")
-            rows = cur.fetchall()
-
-            for r in rows:
-                self.tree.insert("", "end",
-                                 values=(r["prn"], r["roll_no"], r["name"], r["class"], r["division"], r["email"]))
-
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-        finally:
-            conn.close()
+    def load_students(self):
+        self._show_students(self.STUDENT_SQL, (), ("roll_no", "prn"))
 
     def search_students(self):
         q = self.search_var.get().strip()
-        for r in self.tree.get_children():
-            self.tree.delete(r)
         if q:
-            rows = self.run_query(
-                "SELECT prn, roll_no, name, class, division, email FROM students "
-                "WHERE name LIKE ? OR prn LIKE ? OR email LIKE ? ORDER BY name",
-                (f"%{q}%", f"%{q}%", f"%{q}%")
-            )
+            self._show_students(self.STUDENT_SQL + " WHERE name LIKE ? OR prn LIKE ? OR email LIKE ?",
+                                (f"%{q}%", f"%{q}%", f"%{q}%"), ("name", "prn"))
         else:
-            rows = self.run_query("SELECT prn, roll_no, name, class, division, email FROM students ORDER BY name")
-        for row in rows:
-            self.tree.insert("", "end", values=row)
+            self._show_students(self.STUDENT_SQL, (), ("name", "prn"))
+
+    def _show_students(self, sql, params, keys):
+        # Paged: rows are fetched a page at a time as the table scrolls
+        try:
+            self.table.set_query(sql, params, keys=keys)
+        except Exception as e:
+            self.table.clear()
+            messagebox.showerror("Error", str(e))
 
     # ---------- Add / Edit ----------
     def open_add_window(self):
         self.photo_blob = None
+        self.preview_jpeg = None
+        self.extra_photos = []
         self.preview_img = None
         self.selected_prn_for_edit = None
         self._open_form_window("Add Student")
@@ -155,29 +139,55 @@ class StudentModule(ttk.Frame):
             return
         item = self.tree.item(sel[0])["values"]
         self.selected_prn_for_edit = item[0]
-        rows = self.run_query("SELECT prn, roll_no, name, class, division, email, password, photo FROM students WHERE prn=?",
-                              (self.selected_prn_for_edit,))
-        self.photo_blob = rows[0][7] if rows else None
+        self.extra_photos = []
+        self.photo_blob = None
+        prn = self.selected_prn_for_edit
+        rows = self.run_query("SELECT photo_key FROM students WHERE prn=?", (prn,))
+        try:
+            # cached avatar by key; the full photo is only read if it was never rendered
+            self.preview_jpeg = thumbnails.load(
+                rows[0][0], full=lambda: image_store.load_student_photo(prn)) if rows else None
+        except Exception as e:
+            print(f"⚠ Photo missing for PRN {self.selected_prn_for_edit} → {e}")
+            self.preview_jpeg = None
         self._open_form_window("Edit Student", data=item)
 
     # ---------- Upload ----------
     def upload_photo(self, parent_win):
         file_path = filedialog.askopenfilename(title="Select Photo", filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
         if file_path:
-            img = Image.open(file_path)
-            b = io.BytesIO()
-            img.save(b, format="PNG")
-            self.photo_blob = b.getvalue()
-            img.thumbnail((120, 120))
-            self.preview_img = ImageTk.PhotoImage(img)
-            parent_win.preview_label.config(image=self.preview_img)
-            parent_win.preview_label.image = self.preview_img
+            try:
+                data, _, _ = ingest.normalize(file_path)
+                self.preview_jpeg = thumbnails.render_all(data)["avatar"]
+            except Exception as e:
+                messagebox.showerror("Photo", f"Could not read image:\n{e}")
+                return
+            self.photo_blob = data
+            self._show_preview(parent_win)
+
+    def _show_preview(self, win):
+        img = Image.open(io.BytesIO(self.preview_jpeg))
+        self.preview_img = ImageTk.PhotoImage(img)
+        win.preview_label.config(image=self.preview_img)
+        win.preview_label.image = self.preview_img
+
+    def add_enrollment_photos(self, parent_win):
+        """More photos of the same student (different angle/lighting) for better recognition."""
+        paths = filedialog.askopenfilenames(title="Select Enrollment Photos",
+                                            filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
+        for path in paths:
+            try:
+                self.extra_photos.append(ingest.normalize(path)[0])
+            except Exception as e:
+                print(f"⚠ Skipping unreadable photo {path} → {e}")
+        if self.extra_photos:
+            parent_win.extra_var.set(f"{len(self.extra_photos)} extra photo(s) selected")
 
     # ---------- Form Window ----------
     def _open_form_window(self, title, data=None):
         win = tk.Toplevel(self)
         win.title(title)
-        win.geometry("560x700")
+        win.geometry("560x780")
         win.configure(bg="#0a192f")
         win.grab_set()
         win.preview_label = None
@@ -234,13 +244,18 @@ class StudentModule(ttk.Frame):
         win.preview_label = tk.Label(form, bg="#112240")
         win.preview_label.grid(row=photo_row+1, column=1, sticky="w", padx=6, pady=10)
 
-        if self.photo_blob:
+        tk.Label(form, text="Extra Photos (optional)", font=("Segoe UI", 11, "bold"), fg="white", bg="#112240")\
+            .grid(row=photo_row+2, column=0, sticky="w", padx=10, pady=8)
+        tk.Button(form, text="Add Photos", bg="#64ffda", fg="black", width=14,
+                  font=("Segoe UI", 10, "bold"), relief="flat", command=lambda: self.add_enrollment_photos(win))\
+            .grid(row=photo_row+2, column=1, sticky="w", padx=6, pady=6)
+        win.extra_var = tk.StringVar(value="")
+        tk.Label(form, textvariable=win.extra_var, fg="white", bg="#112240")\
+            .grid(row=photo_row+3, column=1, sticky="w", padx=6)
+
+        if self.preview_jpeg:
             try:
-                img = Image.open(io.BytesIO(self.photo_blob))
-                img.thumbnail((120,120))
-                self.preview_img = ImageTk.PhotoImage(img)
-                win.preview_label.config(image=self.preview_img)
-                win.preview_label.image = self.preview_img
+                self._show_preview(win)
             except: pass
 
         # Buttons
@@ -270,29 +285,86 @@ class StudentModule(ttk.Frame):
             return
 
         try:
+            # photo bytes go to the image store when enabled; the row keeps only the reference
+            photo, photo_ref = image_store.store_for_row(self.photo_blob)
+            photo_key = image_store.make_ref(self.photo_blob) if self.photo_blob else None
             conn = get_connection()
             cur = conn.cursor()
             if data:  # edit
+                sets = ["roll_no=?", "name=?", "class=?", "division=?", "email=?"]
+                params = [roll_no, name, class_, division, email]
                 if password:
-                    hashed = hash_password(password)
-                    cur.execute("UPDATE students SET roll_no=?, name=?, class=?, division=?, email=?, password=?, photo=? WHERE prn=?",
-                                (roll_no, name, class_, division, email, hashed, self.photo_blob, prn))
-                else:
-                    cur.execute("UPDATE students SET roll_no=?, name=?, class=?, division=?, email=?, photo=? WHERE prn=?",
-                                (roll_no, name, class_, division, email, self.photo_blob, prn))
+                    sets.append("password=?")
+                    params.append(hash_password(password))
+                # the stored photo is only rewritten when a new one was uploaded
+                if self.photo_blob:
+                    sets += ["photo=?", "photo_ref=?", "photo_key=?"]
+                    params += [photo, photo_ref, photo_key]
+                cur.execute(f"UPDATE students SET {', '.join(sets)} WHERE prn=?", params + [prn])
             else:  # add
                 hashed = hash_password(password)
-                cur.execute("INSERT INTO students (prn, roll_no, name, class, division, email, password, photo) VALUES (?,?,?,?,?,?,?,?)",
-                            (prn, roll_no, name, class_, division, email, hashed, self.photo_blob))
+                cur.execute("INSERT INTO students (prn, roll_no, name, class, division, email, password, photo, photo_ref, photo_key) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                            (prn, roll_no, name, class_, division, email, hashed, photo, photo_ref, photo_key))
             conn.commit()
             conn.close()
-            self.load_students()
-            win.destroy()
-            messagebox.showinfo("Success", "Student saved successfully!")
         except Exception as e:
             messagebox.showerror("Database Error", str(e))
             try: conn.close()
             except: pass
+            return
+
+        # Thumbnails and face encodings are made once here, off the Tk thread, so views and
+        # recognition never decode the photo; grading several photos takes seconds
+        photo_blob, extra_photos = self.photo_blob, list(self.extra_photos)
+        if photo_blob or extra_photos:
+            if self.worker is None:
+                self.worker = BackgroundWorker(self)
+            self.status_var.set(f"⏳ Enrolling face for {prn}...")
+            self.worker.submit(
+                self._enroll_job, prn, photo_blob, extra_photos,
+                on_done=lambda result: self._on_enroll_done(prn, result),
+                on_error=lambda e: self._on_enroll_error(prn, e),
+            )
+
+        self.load_students()
+        win.destroy()
+        messagebox.showinfo("Success", "Student saved successfully!")
+
+    @staticmethod
+    def _enroll_job(job, prn, photo_blob, extra_photos):
+        # runs on the worker thread — no Tk calls here
+        if photo_blob:
+            try:
+                thumbnails.store(photo_blob)
+            except Exception as e:
+                print(f"⚠ Thumbnail failed for PRN {prn} → {e}")
+        from utils.face_recognition_utils import store_student_encoding, enroll_student_photos
+        if photo_blob:
+            store_student_encoding(prn, photo_blob)
+        results = enroll_student_photos(prn, extra_photos) if extra_photos else []
+        # main photo, extra photos or an earlier enrollment — any of them makes the PRN matchable
+        conn = get_connection()
+        try:
+            row = conn.execute("SELECT length(encoding) FROM face_encodings WHERE prn=?", (prn,)).fetchone()
+        finally:
+            conn.close()
+        return bool(row and row[0]), results
+
+    def _on_enroll_done(self, prn, result):
+        stored, results = result
+        self.status_var.set("")
+        rejected = [reason for _, reason in results if reason]
+        if rejected:
+            messagebox.showwarning(
+                "Photos", f"{prn}: {len(rejected)} of {len(results)} extra photo(s) not used: " + ", ".join(sorted(set(rejected)))
+            )
+        if not stored:
+            messagebox.showwarning("Photo", f"No usable face in the photos of {prn}. This student cannot be auto-recognized.")
+
+    def _on_enroll_error(self, prn, e):
+        self.status_var.set("")
+        print(f"❌ Encoding failed for PRN {prn} → {e}")
+        messagebox.showwarning("Photo", f"Face enrollment failed for {prn}:\n{e}")
 
     # ---------- Delete ----------
     def delete_student(self):
@@ -304,21 +376,45 @@ class StudentModule(ttk.Frame):
         prn = item[0]
         name = item[2]
         if messagebox.askyesno("Delete", f"Delete student {name} ({prn})?"):
+            self.run_query("DELETE FROM face_encodings WHERE prn=?", (prn,), fetch=False)
+            self.run_query("DELETE FROM face_templates WHERE prn=?", (prn,), fetch=False)
             self.run_query("DELETE FROM students WHERE prn=?", (prn,), fetch=False)
+            try:
+                from utils.face_recognition_utils import mark_student_changed
+                mark_student_changed(prn)
+            except Exception as e:
+                print(f"⚠ Could not refresh face cache for PRN {prn} → {e}")
             self.load_students()
 
     # ---------- Export ----------
     def generate_excel(self):
-        try:
-            rows = self.run_query("SELECT prn, roll_no, name, class, division, email FROM students ORDER BY name")
-            if not rows:
-                messagebox.showinfo("No Data", "No student data found.")
-                return
-            df = pd.DataFrame(rows, columns=["PRN", "Roll No", "Name", "Class", "Division", "Email"])
-            save_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")],
-                                                     title="Save Excel File")
-            if save_path:
-                df.to_excel(save_path, index=False)
-                messagebox.showinfo("Success", f"Excel file saved to:\n{save_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate Excel file:\n{e}")
+        save_path = filedialog.asksaveasfilename(defaultextension=".xlsx",
+                                                 filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")],
+                                                 title="Save Excel File")
+        if not save_path:
+            return
+        # Streamed from the database on a background thread
+        if self.worker is None:
+            self.worker = BackgroundWorker(self)
+        self.status_var.set("⏳ Exporting...")
+        self.worker.submit(
+            export_job, save_path, ["PRN", "Roll No", "Name", "Class", "Division", "Email"],
+            sql=self.STUDENT_SQL + " ORDER BY name", sheet_title="Students",
+            on_progress=lambda stage, info: self.status_var.set(progress_text(info)),
+            on_done=self._on_excel_done,
+            on_error=self._on_excel_error,
+        )
+
+    def _on_excel_done(self, result):
+        save_path, rows = result
+        self.status_var.set("")
+        if not rows:
+            try: os.remove(save_path)
+            except: pass
+            messagebox.showinfo("No Data", "No student data found.")
+            return
+        messagebox.showinfo("Success", f"Excel file saved to:\n{save_path}")
+
+    def _on_excel_error(self, e):
+        self.status_var.set("")
+        messagebox.showerror("Error", f"Failed to generate Excel file:\n{e}")
@@ -0,0 +1,162 @@
+# utils/analytics_export.py
+#
+# Incremental Parquet export of attendance history for offline analytics.
+#   analytics/date=YYYY-MM-DD/class=<class>/part-<first id>-<last id>.parquet
+#   (hive-style partitions next to attendance.db; any Arrow/Parquet reader
+#   can load the folder as one dataset without touching the live database)
+#
+# Each run exports only attendance rows created after the previous run's
+# watermark (created_at, id), kept in analytics/_export_state.json. Deleting
+# the folder forces a full re-export. Status changes made later by an upsert
+# keep their original created_at and are not re-exported.
+#
+# pyarrow is optional: without it export_parquet() raises a RuntimeError.
+#
+#   python -m utils.analytics_export            nightly / manual run
+#   python -m utils.analytics_export --full     ignore the watermark
+
+import json
+import os
+import shutil
+import sys
+from urllib.parse import quote
+
+from utils import database
+from utils.database import get_connection, ensure_schema
+
+BATCH_ROWS = 50000
+STATE_FILE = "_export_state.json"
+
+EXPORT_SQL = """
+    SELECT a.id, a.prn, s.roll_no, s.name AS student_name,
+           COALESCE(s.class, '') AS class, s.division,
+           a.subject_id, sub.name AS subject, a.teacher_id, t.name AS teacher,
+           a.date, a.time, a.status, a.remarks, a.group_photo_id,
+           a.location, a.latitude, a.longitude,
+           a.created_at
+    FROM attendance a
+    LEFT JOIN students s ON s.prn = a.prn
+    LEFT JOIN subjects sub ON sub.id = a.subject_id
+    LEFT JOIN teachers t ON t.id = a.teacher_id
+    WHERE (a.created_at, a.id) > (?, ?)
+    ORDER BY a.created_at, a.id
+"""
+
+# (column, arrow type name); date and class live in the partition path
+COLUMNS = [
+    ("id", "int64"), ("prn", "string"), ("roll_no", "string"), ("student_name", "string"),
+    ("division", "string"), ("subject_id", "int64"), ("subject", "string"),
+    ("teacher_id", "int64"), ("teacher", "string"), ("time", "string"), ("status", "string"),
+    ("remarks", "string"), ("group_photo_id", "int64"), ("location", "string"),
+    ("latitude", "float64"), ("longitude", "float64"), ("created_at", "string"),
+]
+
+
+def export_dir():
+    return os.path.join(os.path.dirname(database.DB_PATH), "analytics")
+
+
+# ---------------- Watermark ----------------
+def load_state(root=None):
+    path = os.path.join(root or export_dir(), STATE_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        return state.get("created_at", ""), int(state.get("id", 0))
+    except (OSError, ValueError):
+        return "", 0
+
+
+def save_state(created_at, last_id, root=None):
+    root = root or export_dir()
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"created_at": created_at, "id": last_id}, f)
+    os.replace(path + ".tmp", path)
+
+
+# ---------------- Rows → Partitions ----------------
+def iter_batches(since=("", 0), batch=BATCH_ROWS):
+    """Attendance rows newer than the watermark, in (created_at, id) order, batch by batch."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(EXPORT_SQL, since)
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            yield [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def partition(rows):
+    """{(date, class): [rows]} for one batch."""
+    parts = {}
+    for r in rows:
+        parts.setdefault((r["date"], r["class"]), []).append(r)
+    return parts
+
+
+def partition_path(root, date, class_name, rows):
+    folder = os.path.join(root, f"date={quote(date, safe='-')}", f"class={quote(class_name, safe='')}")
+    return os.path.join(folder, f"part-{rows[0]['id']}-{rows[-1]['id']}.parquet")
+
+
+def _write_parquet(path, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in COLUMNS])
+    table = pa.table({name: [r[name] for r in rows] for name, _ in COLUMNS}, schema=schema)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+# ---------------- Export ----------------
+def export_parquet(root=None, full=False, progress=None, writer=None):
+    """
+    Export new attendance rows to partitioned Parquet under root.
+    progress(rows_done) is called after every batch and may raise to abort;
+    the watermark only advances past batches that were fully written.
+    Returns the number of rows exported.
+    """
+    if writer is None:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        writer = _write_parquet
+
+    ensure_schema()
+    root = root or export_dir()
+    since = ("", 0) if full else load_state(root)
+    if full and os.path.isdir(root):
+        # batch boundaries may differ from earlier runs, so old part files would duplicate rows
+        for name in os.listdir(root):
+            if name.startswith("date="):
+                shutil.rmtree(os.path.join(root, name))
+
+    done = 0
+    for rows in iter_batches(since):
+        for (date, class_name), part in partition(rows).items():
+            # file names come from the id range, so a re-run after a crash overwrites, never duplicates
+            writer(partition_path(root, date, class_name, part), part)
+        done += len(rows)
+        save_state(rows[-1]["created_at"], rows[-1]["id"], root)
+        if progress:
+            progress(done)
+
+    return done
+
+
+def export_parquet_job(job, root=None, full=False):
+    """BackgroundWorker job wrapper; reports ("exported", {"rows": n, "total": None})."""
+    return export_parquet(root, full, progress=lambda n: job.report("exported", {"rows": n, "total": None}))
+
+
+if __name__ == "__main__":
+    n = export_parquet(full="--full" in sys.argv)
+    print(f"🟢 Exported {n} attendance row(s) to {export_dir()}")
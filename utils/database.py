@@ -1,21 +1,210 @@
 import sqlite3
 import os
 import hashlib
+import itertools
+import threading
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "..", "attendance.db")
 DB_PATH = os.path.abspath(DB_PATH)
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+# 128-d face vectors computed once per stored photo (see utils/face_recognition_utils)
+FACE_ENCODINGS_SQL = """
+    CREATE TABLE IF NOT EXISTS face_encodings (
+        prn TEXT PRIMARY KEY,
+        photo_hash TEXT NOT NULL,
+        encoding BLOB NOT NULL,
+        created_at TEXT DEFAULT (datetime('now')),
+        FOREIGN KEY (prn) REFERENCES students(prn)
+    )
+"""
+
+# Every scored enrollment photo per student; face_encodings.encoding packs the
+# best TEMPLATES_PER_STUDENT accepted ones (see utils/recognition_engine).
+FACE_TEMPLATES_SQL = """
+    CREATE TABLE IF NOT EXISTS face_templates (
+        prn TEXT NOT NULL,
+        photo_hash TEXT NOT NULL,
+        source TEXT NOT NULL DEFAULT 'extra',
+        encoding BLOB NOT NULL,
+        quality REAL NOT NULL DEFAULT 0,
+        reason TEXT,
+        created_at TEXT DEFAULT (datetime('now')),
+        PRIMARY KEY (prn, photo_hash),
+        FOREIGN KEY (prn) REFERENCES students(prn)
+    )
+"""
+
+# Small JPEG renditions per photo, keyed by the image store reference (utils/thumbnails)
+THUMBNAILS_SQL = """
+    CREATE TABLE IF NOT EXISTS thumbnails (
+        photo_ref TEXT NOT NULL,
+        size TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (photo_ref, size)
+    ) WITHOUT ROWID
+"""
+
+# -------------------- CONNECTION MANAGER --------------------
+# One sqlite3 connection per thread, reused by every get_connection() call on
+# that thread. WAL lets the recognition worker write while the Tk thread reads.
+#
+# Handle contract (several handles can be open on one thread at once, nested —
+# an inner handle is closed before the outer one is used again):
+#   - a handle opened while the connection is idle owns the next transaction:
+#     commit / rollback act on it like a private connection, and close() rolls
+#     back whatever it left uncommitted (the outer handle had nothing pending)
+#   - a handle opened while the connection is inside a transaction gets a
+#     SAVEPOINT: its commit() releases into the outer transaction (the outer
+#     handle still decides), its rollback() / close() undo only its own work
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",     # safe with WAL, far fewer fsyncs than FULL
+    "cache_size": -16000,        # negative = KiB → ~16 MB page cache per connection
+    "mmap_size": 268435456,      # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 10000,       # ms to wait on a lock instead of "database is locked"
+}
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_S = 10
+
+_local = threading.local()
+# bumped by configure(); each thread reopens its connection once no handle is open
+_generation = 0
+_savepoints = itertools.count(1)
+
+
+def configure(**pragmas):
+    """Override pragmas; every thread picks them up on its next get_connection()."""
+    global _generation
+    PRAGMAS.update(pragmas)
+    _generation += 1
+
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S, cached_statements=STATEMENT_CACHE_SIZE)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
     return conn
 
+
+class PooledConnection:
+    """
+    Thin handle over the thread's shared connection (see the contract above).
+    close() only releases the handle; uncommitted work is rolled back, matching
+    what closing a private connection used to do.
+    """
+
+    __slots__ = ("_state", "_closed", "_savepoint", "_owns_tx")
+
+    def __init__(self, state):
+        object.__setattr__(self, "_state", state)
+        object.__setattr__(self, "_closed", False)
+        object.__setattr__(self, "_savepoint", None)
+        object.__setattr__(self, "_owns_tx", not state["conn"].in_transaction)
+        if not self._owns_tx:
+            self._begin_savepoint()
+
+    def __getattr__(self, name):
+        return getattr(self._state["conn"], name)
+
+    def __setattr__(self, name, value):
+        setattr(self._state["conn"], name, value)
+
+    def _begin_savepoint(self):
+        name = f"handle_{next(_savepoints)}"
+        self._state["conn"].execute(f"SAVEPOINT {name}")
+        object.__setattr__(self, "_savepoint", name)
+
+    def _end_savepoint(self, undo):
+        name, conn = self._savepoint, self._state["conn"]
+        object.__setattr__(self, "_savepoint", None)
+        if not conn.in_transaction:
+            return  # the outer transaction already ended
+        try:
+            if undo:
+                conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+        except sqlite3.OperationalError:
+            pass  # savepoint went with an outer commit / rollback
+
+    def commit(self):
+        if self._savepoint:
+            self._end_savepoint(undo=False)
+            self._begin_savepoint()
+        else:
+            self._state["conn"].commit()
+
+    def rollback(self):
+        if self._savepoint:
+            self._end_savepoint(undo=True)
+            self._begin_savepoint()
+        else:
+            self._state["conn"].rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def close(self):
+        if self._closed:
+            return
+        object.__setattr__(self, "_closed", True)
+        state = self._state
+        conn = state["conn"]
+        if self._savepoint:
+            self._end_savepoint(undo=True)
+        elif self._owns_tx and conn.in_transaction:
+            conn.rollback()
+        state["depth"] -= 1
+        if state["depth"] <= 0:
+            state["depth"] = 0
+            if conn.in_transaction:
+                conn.rollback()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def get_connection():
+    state = getattr(_local, "state", None)
+    stale = state is not None and (
+        state["path"] != DB_PATH or (state["gen"] != _generation and state["depth"] == 0)
+    )
+    if state is None or stale:
+        close_thread_connection()
+        state = {"conn": _open_connection(DB_PATH), "path": DB_PATH, "gen": _generation, "depth": 0}
+        _local.state = state
+
+    state["conn"].row_factory = sqlite3.Row
+    state["depth"] += 1
+    return PooledConnection(state)
+
+
+def close_thread_connection():
+    state = getattr(_local, "state", None)
+    if state is not None:
+        state["conn"].close()
+        _local.state = None
+
 def hash_password(password: str):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def init_db():
-    conn = get_connection()
+    applied = run_migrations()
+    print(f"\n🟢 DATABASE FIXED SUCCESSFULLY! (schema v{schema_version()}, {applied} migration(s) applied)\n")
+
+def _create_base_tables(conn):
+    # schema as first shipped by init_db; later columns come from migrations 2-4 and 6
     cur = conn.cursor()
 
     # -------------------- STUDENTS TABLE --------------------
@@ -97,9 +286,365 @@ def init_db():
         )
     """)
 
+# -------------------- GROUP PHOTO STORAGE --------------------
+def ensure_group_photo_refs(conn):
+    """Older databases: add group_photos.photo_hash and attendance.group_photo_id."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(group_photos)")
+    if "photo_hash" not in [r[1] for r in cur.fetchall()]:
+        cur.execute("ALTER TABLE group_photos ADD COLUMN photo_hash TEXT")
+    cur.execute("PRAGMA table_info(attendance)")
+    if "group_photo_id" not in [r[1] for r in cur.fetchall()]:
+        cur.execute("ALTER TABLE attendance ADD COLUMN group_photo_id INTEGER REFERENCES group_photos(id)")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_group_photos_hash ON group_photos(photo_hash)")
+
+def store_group_photo(cur, photo_bytes, teacher_id, subject_id, class_name, division,
+                      date, time, location=None, latitude=None, longitude=None, thumbs=None):
+    """
+    Return the group_photos id for these bytes, inserting only if the image is new.
+    With the image store enabled the bytes go to disk and the row keeps a reference.
+    thumbs: already rendered thumbnails (thumbnails.render_all) to cache with the photo.
+    """
+    from utils import image_store, thumbnails
+
+    digest = hashlib.sha256(photo_bytes).hexdigest()
+    cur.execute("SELECT id FROM group_photos WHERE photo_hash=?", (digest,))
+    row = cur.fetchone()
+    if row:
+        return row[0]
+
+    blob, ref = image_store.store_for_row(photo_bytes)
+    try:
+        thumbnails.store(photo_bytes, cur, rendered=thumbs)
+    except Exception as e:
+        print(f"⚠ Thumbnail failed for group photo → {e}")
+    cur.execute("""
+        INSERT INTO group_photos(teacher_id, subject_id, class, division, date, time, timestamp,
+                                 photo, photo_hash, photo_ref, location, latitude, longitude)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (teacher_id, subject_id, class_name or "", division or "", date, time, f"{date} {time}",
+          blob if blob is not None else b"", digest, ref, location, latitude, longitude))
+    return cur.lastrowid
+
+def upsert_attendance(cur, rows, subject_id, teacher_id, date, time, group_photo_id=None,
+                      location=None, latitude=None, longitude=None):
+    """
+    rows = [(prn, status), ...] in one executemany.
+    UNIQUE(prn, subject_id, date) → a re-snap updates the day's row instead of adding one;
+    rows reference the group photo instead of copying it.
+    """
+    cur.executemany("""
+        INSERT INTO attendance(prn, subject_id, teacher_id, date, time, status, group_photo_id,
+                               location, latitude, longitude)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(prn, subject_id, date) DO UPDATE SET
+            teacher_id=excluded.teacher_id,
+            time=excluded.time,
+            status=excluded.status,
+            group_photo_id=excluded.group_photo_id,
+            photo=NULL,
+            location=excluded.location,
+            latitude=excluded.latitude,
+            longitude=excluded.longitude
+    """, [
+        (prn, subject_id, teacher_id, date, time, status, group_photo_id, location, latitude, longitude)
+        for prn, status in rows
+    ])
+
+def migrate_attendance_photos():
+    """
+    One-shot: collapse the per-student copies in attendance.photo into single
+    group_photos rows and point attendance.group_photo_id at them.
+    Rows are streamed one at a time so memory stays flat.
+    """
+    ensure_schema()
+    conn = get_connection()
+    cur = conn.cursor()
+
+    # hash any group_photos saved before photo_hash existed (first copy wins)
+    cur.execute("SELECT id FROM group_photos WHERE photo_hash IS NULL")
+    for (gid,) in cur.fetchall():
+        blob = conn.execute("SELECT photo FROM group_photos WHERE id=?", (gid,)).fetchone()[0]
+        digest = hashlib.sha256(blob).hexdigest()
+        dup = conn.execute("SELECT id FROM group_photos WHERE photo_hash=?", (digest,)).fetchone()
+        if dup:
+            conn.execute("UPDATE attendance SET group_photo_id=? WHERE group_photo_id=?", (dup[0], gid))
+            conn.execute("DELETE FROM group_photos WHERE id=?", (gid,))
+        else:
+            conn.execute("UPDATE group_photos SET photo_hash=? WHERE id=?", (digest, gid))
+
+    cur.execute("SELECT id FROM attendance WHERE photo IS NOT NULL ORDER BY id")
+    ids = [r[0] for r in cur.fetchall()]
+
+    moved = 0
+    for aid in ids:
+        r = conn.execute("""
+            SELECT a.photo, a.teacher_id, a.subject_id, a.date, a.time, a.location, a.latitude, a.longitude,
+                   s.class, s.division
+            FROM attendance a LEFT JOIN students s ON s.prn = a.prn
+            WHERE a.id=?
+        """, (aid,)).fetchone()
+        gid = store_group_photo(conn.cursor(), r["photo"], r["teacher_id"], r["subject_id"], r["class"],
+                                r["division"], r["date"], r["time"], r["location"], r["latitude"],
+                                r["longitude"])
+        conn.execute("UPDATE attendance SET group_photo_id=?, photo=NULL WHERE id=?", (gid, aid))
+        moved += 1
+        if moved % 500 == 0:
+            conn.commit()
+
     conn.commit()
+    cur.execute("SELECT COUNT(*) FROM group_photos")
+    photos = cur.fetchone()[0]
+    conn.execute("VACUUM")
     conn.close()
-    print("\n🟢 DATABASE FIXED SUCCESSFULLY!\n")
+    print(f"🟢 Moved {moved} attendance photo(s) into {photos} group photo(s)")
+    return moved
+
+# -------------------- SCHEMA MIGRATIONS --------------------
+# Append-only. Never edit a step that has shipped (fresh and upgraded databases
+# must reach each version through the same DDL); add a new numbered step instead.
+# Each step must be safe on databases created by any older version of init_db
+# (check before ALTER, use IF NOT EXISTS).
+def _m_students_photo_column(conn):
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(students)").fetchall()]
+    if "photo" not in cols:
+        conn.execute("ALTER TABLE students ADD COLUMN photo BLOB")
+
+def _m_face_encodings(conn):
+    conn.execute(FACE_ENCODINGS_SQL)
+
+def _m_face_templates(conn):
+    conn.execute(FACE_TEMPLATES_SQL)
+
+def _m_thumbnails(conn):
+    conn.execute(THUMBNAILS_SQL)
+
+# Change log for the recognition cache: every write that can change a student's
+# gallery rows appends the PRN, so each process syncs from a monotonic seq
+# watermark (AUTOINCREMENT never reuses a seq) instead of timestamps.
+FACE_CHANGES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS face_encoding_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        prn TEXT NOT NULL
+    )
+    """,
+    """CREATE TRIGGER IF NOT EXISTS trg_face_encodings_insert AFTER INSERT ON face_encodings
+       BEGIN INSERT INTO face_encoding_changes(prn) VALUES (NEW.prn); END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_face_encodings_update AFTER UPDATE ON face_encodings
+       BEGIN
+           INSERT INTO face_encoding_changes(prn) VALUES (NEW.prn);
+           INSERT INTO face_encoding_changes(prn) SELECT OLD.prn WHERE OLD.prn <> NEW.prn;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_face_encodings_delete AFTER DELETE ON face_encodings
+       BEGIN INSERT INTO face_encoding_changes(prn) VALUES (OLD.prn); END""",
+    # a new main photo or a removed student re-reads the PRN
+    """CREATE TRIGGER IF NOT EXISTS trg_students_photo_change AFTER UPDATE OF photo, photo_ref ON students
+       BEGIN INSERT INTO face_encoding_changes(prn) VALUES (NEW.prn); END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_students_delete_face AFTER DELETE ON students
+       BEGIN INSERT INTO face_encoding_changes(prn) VALUES (OLD.prn); END""",
+]
+
+def _m_face_encoding_changes(conn):
+    for stmt in FACE_CHANGES_SQL:
+        conn.execute(stmt)
+
+def _m_access_path_indexes(conn):
+    # Reports: WHERE a.date BETWEEN ? AND ?; admin trend: GROUP BY date, status
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_date
+        ON attendance(date, prn, subject_id, teacher_id, status)
+    """)
+    # Student dashboard: COUNT / GROUP BY subject_id WHERE prn=? (covering, no table lookups)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_prn_status
+        ON attendance(prn, status, subject_id)
+    """)
+    # Teacher dashboard: WHERE class=? AND division=? ORDER BY roll_no
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_students_class_division
+        ON students(class, division, roll_no, prn, name)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_group_photo ON attendance(group_photo_id)")
+    conn.execute("ANALYZE")
+
+def _m_photo_refs(conn):
+    # Content-addressed image store (utils/image_store): rows keep "sha256:<hex>" instead of BLOBs
+    for table in ("students", "group_photos"):
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if "photo_ref" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN photo_ref TEXT")
+
+def _m_student_photo_key(conn):
+    # "sha256:<hex>" of the main photo (same key as image_store refs and thumbnails),
+    # so views find the avatar without reading an inline BLOB
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(students)").fetchall()]
+    if "photo_key" not in cols:
+        conn.execute("ALTER TABLE students ADD COLUMN photo_key TEXT")
+    conn.execute("UPDATE students SET photo_key = photo_ref WHERE photo_key IS NULL AND photo_ref IS NOT NULL")
+    prns = [r[0] for r in conn.execute(
+        "SELECT prn FROM students WHERE photo_key IS NULL AND length(photo) > 0").fetchall()]
+    for prn in prns:
+        blob = conn.execute("SELECT photo FROM students WHERE prn=?", (prn,)).fetchone()[0]
+        conn.execute("UPDATE students SET photo_key=? WHERE prn=?",
+                     ("sha256:" + hashlib.sha256(blob).hexdigest(), prn))
+
+# -------------------- ATTENDANCE ROLLUPS --------------------
+# Dashboard counters kept in step with attendance by triggers, so every write
+# path (teacher snap, manual marking, edits) updates them in the same transaction.
+#   attendance_student_subject → per PRN × subject totals (student dashboard)
+#   attendance_daily           → per date totals (admin trend)
+ROLLUP_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS attendance_student_subject (
+        prn TEXT NOT NULL,
+        subject_id INTEGER NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        present INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (prn, subject_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS attendance_daily (
+        date TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        present INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+]
+
+def _rollup_apply_sql(row, sign):
+    """Trigger statements adding (sign=1) or removing (sign=-1) one attendance row."""
+    present = f"({row}.status = 'Present')"
+    return f"""
+        INSERT INTO attendance_student_subject(prn, subject_id, total, present)
+        VALUES ({row}.prn, {row}.subject_id, {sign}, {sign} * {present})
+        ON CONFLICT(prn, subject_id) DO UPDATE SET
+            total = total + excluded.total, present = present + excluded.present;
+        INSERT INTO attendance_daily(date, total, present)
+        VALUES ({row}.date, {sign}, {sign} * {present})
+        ON CONFLICT(date) DO UPDATE SET
+            total = total + excluded.total, present = present + excluded.present;
+    """
+
+ROLLUP_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_insert
+        AFTER INSERT ON attendance BEGIN {_rollup_apply_sql("NEW", 1)} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_delete
+        AFTER DELETE ON attendance BEGIN {_rollup_apply_sql("OLD", -1)} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_update
+        AFTER UPDATE OF prn, subject_id, date, status ON attendance
+        BEGIN {_rollup_apply_sql("OLD", -1)} {_rollup_apply_sql("NEW", 1)} END""",
+]
+
+def rebuild_attendance_rollups(conn=None):
+    """Recompute both rollup tables from attendance (fixes any drift). Returns rows scanned."""
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        if own:
+            conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM attendance_student_subject")
+        conn.execute("DELETE FROM attendance_daily")
+        conn.execute("""
+            INSERT INTO attendance_student_subject(prn, subject_id, total, present)
+            SELECT prn, subject_id, COUNT(*), SUM(status = 'Present')
+            FROM attendance WHERE subject_id IS NOT NULL
+            GROUP BY prn, subject_id
+        """)
+        conn.execute("""
+            INSERT INTO attendance_daily(date, total, present)
+            SELECT date, COUNT(*), SUM(status = 'Present')
+            FROM attendance GROUP BY date
+        """)
+        scanned = conn.execute("SELECT COALESCE(SUM(total), 0) FROM attendance_daily").fetchone()[0]
+        if own:
+            conn.commit()
+        return scanned
+    finally:
+        if own:
+            conn.close()
+
+def _m_attendance_rollups(conn):
+    for stmt in ROLLUP_TABLES + ROLLUP_TRIGGERS:
+        conn.execute(stmt)
+    rebuild_attendance_rollups(conn)
+
+def _m_attendance_created_index(conn):
+    # Incremental analytics export walks attendance by (created_at, id) after a watermark
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_created ON attendance(created_at, id)")
+
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "students.photo column", _m_students_photo_column),
+    (3, "face_encodings table", _m_face_encodings),
+    (4, "group photo references", ensure_group_photo_refs),
+    (5, "access path indexes", _m_access_path_indexes),
+    (6, "image store references", _m_photo_refs),
+    (7, "attendance rollups", _m_attendance_rollups),
+    (8, "attendance created_at index", _m_attendance_created_index),
+    (9, "face_templates table", _m_face_templates),
+    (10, "thumbnails table", _m_thumbnails),
+    (11, "face encoding change log", _m_face_encoding_changes),
+    (12, "students.photo_key", _m_student_photo_key),
+]
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+def schema_version(conn=None):
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT DEFAULT (datetime('now'))
+            )
+        """)
+        row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+        return row[0] or 0
+    finally:
+        if own:
+            conn.close()
+
+def run_migrations():
+    """Apply pending migrations in order, each in its own transaction. Returns how many ran."""
+    conn = get_connection()
+    applied = 0
+    try:
+        current = schema_version(conn)
+        for version, name, step in MIGRATIONS:
+            if version <= current:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                step(conn)
+                conn.execute("INSERT INTO schema_migrations(version, name) VALUES (?, ?)", (version, name))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"🛠 Migration {version}: {name}")
+            applied += 1
+    finally:
+        conn.close()
+    return applied
+
+def ensure_schema():
+    """Run migrations once per process (per database path)."""
+    if DB_PATH in _schema_ready:
+        return
+    with _schema_lock:
+        if DB_PATH not in _schema_ready:
+            run_migrations()
+            _schema_ready.add(DB_PATH)
 
 if __name__ == "__main__":
+    import sys
     init_db()
+    if "--migrate-photos" in sys.argv:
+        migrate_attendance_photos()
+    if "--rebuild-rollups" in sys.argv:
+        print(f"🟢 Rollups rebuilt from {rebuild_attendance_rollups()} attendance row(s)")
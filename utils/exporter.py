@@ -0,0 +1,118 @@
+# utils/exporter.py
+#
+# Streaming CSV / Excel export.
+#   - rows come straight from a SQL cursor (fetchmany batches) or any iterable,
+#     never materialised as a list / DataFrame
+#   - .xlsx uses openpyxl's write-only workbook, .csv the csv module;
+#     memory stays constant however many rows the query returns
+#   - written to a temp file and renamed, so a cancelled export leaves nothing behind
+#   - export_job() is meant for BackgroundWorker.submit: progress goes through
+#     job.report("exported", {"rows": n, "total": total}) and cancel is honoured
+#
+# The file type follows the path's extension (.csv, otherwise .xlsx).
+
+import csv
+import os
+
+from utils.database import get_connection
+
+BATCH_ROWS = 1000
+# Progress is reported every this many rows
+REPORT_EVERY = 5000
+
+
+def stream_query(sql, params=(), batch=BATCH_ROWS):
+    """Yield the rows of a query in fetchmany batches on the calling thread's connection."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+    finally:
+        conn.close()
+
+
+def count_query(sql, params=()):
+    conn = get_connection()
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0] or 0
+    finally:
+        conn.close()
+
+
+def _write_csv(path, headers, rows, tick):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            tick()
+
+
+def _write_xlsx(path, headers, rows, tick, sheet_title):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet(title=sheet_title)
+    sheet.append(list(headers))
+    for row in rows:
+        sheet.append(list(row))
+        tick()
+    wb.save(path)
+
+
+def export_rows(path, headers, rows, progress=None, sheet_title="Sheet1"):
+    """
+    Write headers + rows to path (.csv or .xlsx). progress(n) is called every
+    REPORT_EVERY rows and may raise to abort. Returns the number of rows written.
+    """
+    written = [0]
+
+    def tick():
+        written[0] += 1
+        if progress and written[0] % REPORT_EVERY == 0:
+            progress(written[0])
+
+    tmp = f"{path}.part"
+    try:
+        if path.lower().endswith(".csv"):
+            _write_csv(tmp, headers, rows, tick)
+        else:
+            _write_xlsx(tmp, headers, rows, tick, sheet_title)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    if progress:
+        progress(written[0])
+    return written[0]
+
+
+def export_job(job, path, headers, sql=None, params=(), rows=None, sheet_title="Sheet1"):
+    """
+    BackgroundWorker job: export the query (or a prepared iterable of rows) to path.
+    Returns (path, rows written).
+    """
+    total = None
+    if sql is not None:
+        total = count_query(sql, params)
+        rows = stream_query(sql, params)
+    elif hasattr(rows, "__len__"):
+        total = len(rows)
+
+    job.report("exported", {"rows": 0, "total": total})
+    n = export_rows(path, headers, rows, sheet_title=sheet_title,
+                    progress=lambda n: job.report("exported", {"rows": n, "total": total}))
+    return path, n
+
+
+def progress_text(info):
+    """'Exporting… 12,000 / 200,000 rows' for a job.report("exported", info) payload."""
+    if info.get("total") is not None:
+        return f"⏳ Exporting... {info['rows']:,} / {info['total']:,} rows"
+    return f"⏳ Exporting... {info['rows']:,} rows"
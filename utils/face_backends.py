@@ -0,0 +1,145 @@
+# utils/face_backends.py
+#
+# Pluggable face detector / encoder backends for the recognition engine.
+#   detectors: locate(img_np, upsample=None) → [(top, right, bottom, left), ...]
+#     "hog"        dlib HOG (fast, CPU)
+#     "cnn"        dlib MMOD CNN (more robust to pose/lighting; CPU unless dlib has CUDA)
+#     "opencv-dnn" OpenCV res10 SSD (needs the two model files under assets/models)
+#   encoders: encode(img_np, locs) → [128-d vectors], one per box
+#             face_landmarks(img_np, locs) → 5-point landmark dicts (optional, used by the quality gate)
+#     "dlib"       dlib ResNet (face_recognition.face_encodings)
+#
+# Backends are plain picklable objects so the tiled detector can ship them to
+# worker processes. Stored encodings are only comparable within one encoder;
+# switching encoders means re-enrolling (backfill with force).
+
+import os
+
+import numpy as np
+import face_recognition
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "models")
+DNN_PROTOTXT = os.path.join(MODELS_DIR, "deploy.prototxt")
+DNN_WEIGHTS = os.path.join(MODELS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+
+
+# ---------------- Detectors ----------------
+class HogDetector:
+    name = "hog"
+    # smallest face (px) one pass finds without upsampling; see face_detection.downscale_factor
+    window_px = 80
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+
+    def locate(self, img_np, upsample=None):
+        upsample = self.upsample if upsample is None else upsample
+        return face_recognition.face_locations(img_np, number_of_times_to_upsample=upsample, model="hog")
+
+
+class CnnDetector(HogDetector):
+    name = "cnn"
+
+    def locate(self, img_np, upsample=None):
+        upsample = self.upsample if upsample is None else upsample
+        return face_recognition.face_locations(img_np, number_of_times_to_upsample=upsample, model="cnn")
+
+
+# one network per process, loaded on first use
+_dnn_nets = {}
+
+
+class OpenCVDnnDetector:
+    name = "opencv-dnn"
+    window_px = 40
+
+    def __init__(self, prototxt=None, weights=None, confidence=0.6, input_size=300):
+        self.prototxt = prototxt or DNN_PROTOTXT
+        self.weights = weights or DNN_WEIGHTS
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def _net(self):
+        import cv2
+
+        key = (self.prototxt, self.weights)
+        if key not in _dnn_nets:
+            if not (os.path.exists(self.prototxt) and os.path.exists(self.weights)):
+                raise FileNotFoundError(f"OpenCV DNN face model not found in {MODELS_DIR}")
+            _dnn_nets[key] = cv2.dnn.readNetFromCaffe(self.prototxt, self.weights)
+        return _dnn_nets[key]
+
+    def locate(self, img_np, upsample=None):
+        import cv2
+
+        h, w = img_np.shape[:2]
+        size = self.input_size * (2 ** (upsample or 0))
+        blob = cv2.dnn.blobFromImage(
+            cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR), 1.0, (size, size), (104.0, 177.0, 123.0)
+        )
+        net = self._net()
+        net.setInput(blob)
+        out = net.forward()[0, 0]
+
+        boxes = []
+        for det in out[out[:, 2] >= self.confidence]:
+            x0, y0, x1, y1 = (det[3:7] * np.array([w, h, w, h])).astype(int)
+            top, left = max(0, y0), max(0, x0)
+            bottom, right = min(h, y1), min(w, x1)
+            if bottom > top and right > left:
+                boxes.append((int(top), int(right), int(bottom), int(left)))
+        return boxes
+
+
+# ---------------- Encoders ----------------
+class DlibEncoder:
+    name = "dlib"
+    dim = 128
+
+    def __init__(self, num_jitters=1, landmarks="small"):
+        self.num_jitters = num_jitters
+        self.landmarks = landmarks
+
+    def encode(self, img_np, locs):
+        if not locs:
+            return []
+        return face_recognition.face_encodings(
+            img_np, locs, num_jitters=self.num_jitters, model=self.landmarks
+        )
+
+    def face_landmarks(self, img_np, locs):
+        if not locs:
+            return []
+        return face_recognition.face_landmarks(img_np, locs, model="small")
+
+
+DETECTORS = {
+    "hog": HogDetector,
+    "cnn": CnnDetector,
+    "opencv-dnn": OpenCVDnnDetector,
+}
+
+ENCODERS = {
+    "dlib": DlibEncoder,
+}
+
+
+def get_detector(detector=None):
+    """Backend instance from a name ("hog", "cnn", "opencv-dnn"), an instance, or None (HOG)."""
+    if detector is None:
+        return HogDetector()
+    if isinstance(detector, str):
+        if detector not in DETECTORS:
+            raise ValueError(f"Unknown face detector: {detector}")
+        return DETECTORS[detector]()
+    return detector
+
+
+def get_encoder(encoder=None):
+    if encoder is None:
+        return DlibEncoder()
+    if isinstance(encoder, str):
+        if encoder not in ENCODERS:
+            raise ValueError(f"Unknown face encoder: {encoder}")
+        return ENCODERS[encoder]()
+    return encoder
@@ -0,0 +1,260 @@
+# utils/face_detection.py
+#
+# Face detection / encoding strategies for group photos.
+#   detect_and_encode        → single pass on the calling thread (small photos)
+#   detect_and_encode_tiled  → overlapping tiles detected in a process pool,
+#                              seams de-duplicated, crops encoded in parallel
+#   detect_and_encode_downscaled → detect on a shrunken copy sized from the
+#                              expected face size, encode at full resolution
+#   detect_and_encode_auto   → downscale first; re-run tiled when the faces found
+#                              are near the downscale floor (smaller ones were likely missed)
+#
+# Every strategy accepts timings=dict and records seconds per stage into it, and
+# detector/encoder backends from utils/face_backends (default HOG + dlib).
+# Boxes use face_recognition's (top, right, bottom, left) order throughout.
+
+import os
+import time
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils import tracing
+from utils.face_backends import get_detector, get_encoder
+
+# Photos above this many pixels use LARGE_PHOTO_STRATEGY when strategy=None
+LARGE_PHOTO_MIN_PIXELS = 4_000_000
+# "downscale" is fastest; "tiled" keeps full recall for very small faces;
+# "auto" picks between them from the face sizes found (SMARTSNAP_DETECT_STRATEGY)
+LARGE_PHOTO_STRATEGY = os.environ.get("SMARTSNAP_DETECT_STRATEGY", "auto")
+
+# Smallest face (px, full resolution) the downscale path must still find.
+# Lower → less shrinking → more recall, slower. HOG_UPSAMPLE trades the same way.
+DOWNSCALE_MIN_FACE_PX = 120
+HOG_UPSAMPLE = 1
+# auto: a face found below this size (px, full resolution) means the photo has
+# faces near the downscale floor, so the tiled pass runs for recall
+AUTO_TILE_FACE_PX = 180
+
+TILE_SIZE = 1024
+# Overlap must exceed the largest expected face so no face is cut by every tile
+TILE_OVERLAP = 256
+# Boxes from neighbouring tiles overlapping more than this are the same face
+MERGE_IOU = 0.3
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers=None):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+class _Stage:
+    """with _Stage(timings, "detect"): ... → timings["detect"] += seconds"""
+
+    def __init__(self, timings, name):
+        self.timings, self.name = timings, name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.timings is not None:
+            self.timings[self.name] = self.timings.get(self.name, 0.0) + time.perf_counter() - self.t0
+
+
+# ---------------- Single Pass ----------------
+def detect_and_encode(img_np, detector=None, encoder=None, timings=None):
+    detector, encoder = get_detector(detector), get_encoder(encoder)
+    with _Stage(timings, "detect"):
+        locs = detector.locate(img_np)
+    with _Stage(timings, "encode"):
+        encs = encoder.encode(img_np, locs)
+    return locs, encs
+
+
+# ---------------- Downscale → Refine ----------------
+def downscale_factor(min_face_px=None, upsample=None, window_px=80):
+    """Scale at which the smallest expected face is just large enough for the detector window."""
+    min_face_px = min_face_px or DOWNSCALE_MIN_FACE_PX
+    upsample = HOG_UPSAMPLE if upsample is None else upsample
+    # each upsample halves the smallest detectable face
+    detectable = window_px / (2 ** upsample)
+    return min(1.0, detectable / float(min_face_px))
+
+
+def _downscaled_locations(img_np, detector, min_face_px=None, upsample=None, timings=None):
+    """Boxes found on a shrunken copy, mapped back to full-resolution coordinates."""
+    upsample = HOG_UPSAMPLE if upsample is None else upsample
+    scale = downscale_factor(min_face_px, upsample, getattr(detector, "window_px", 80))
+    h, w = img_np.shape[:2]
+
+    with _Stage(timings, "downscale"):
+        if scale < 1.0:
+            small = Image.fromarray(img_np).resize(
+                (max(1, int(w * scale)), max(1, int(h * scale))), Image.BILINEAR
+            )
+            small_np = np.asarray(small, dtype=np.uint8)
+        else:
+            small_np = img_np
+
+    with _Stage(timings, "detect"):
+        small_locs = detector.locate(small_np, upsample=upsample)
+        locs = [
+            (max(0, int(t / scale)), min(w, int(r / scale)), min(h, int(b / scale)), max(0, int(l / scale)))
+            for (t, r, b, l) in small_locs
+        ]
+    return locs
+
+
+def detect_and_encode_downscaled(img_np, detector=None, encoder=None, min_face_px=None, upsample=None,
+                                 timings=None):
+    """Find boxes on a shrunken copy, map them back and encode only inside them at full resolution."""
+    detector, encoder = get_detector(detector), get_encoder(encoder)
+    locs = _downscaled_locations(img_np, detector, min_face_px, upsample, timings)
+    with _Stage(timings, "encode"):
+        encs = encoder.encode(img_np, locs)
+    return locs, encs
+
+
+# ---------------- Tiling ----------------
+def tile_grid(height, width, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """(y0, x0, y1, x1) windows covering the image with the given overlap."""
+    step = max(tile - overlap, 1)
+
+    def starts(size):
+        if size <= tile:
+            return [0]
+        pos = list(range(0, size - tile, step))
+        pos.append(size - tile)
+        return pos
+
+    return [(y, x, min(y + tile, height), min(x + tile, width))
+            for y in starts(height) for x in starts(width)]
+
+
+def _area(box):
+    return max(0, box[2] - box[0]) * max(0, box[1] - box[3])
+
+
+def _same_face(a, b, iou):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if inter == 0:
+        return False
+    smaller = min(_area(a), _area(b))
+    # A face cut by a tile edge gives a partial box mostly inside the full one
+    return inter / float(_area(a) + _area(b) - inter) > iou or inter / float(smaller) > 0.6
+
+
+def merge_boxes(boxes, iou=MERGE_IOU):
+    """Drop duplicate detections of the same face from overlapping tiles (largest box wins)."""
+    kept = []
+    for b in sorted(boxes, key=_area, reverse=True):
+        if not any(_same_face(b, k, iou) for k in kept):
+            kept.append(b)
+    return kept
+
+
+# ---------------- Worker Functions (must be top-level to pickle) ----------------
+def _detect_tile(job):
+    tile_np, y0, x0, detector = job
+    locs = detector.locate(tile_np)
+    return [(t + y0, r + x0, b + y0, l + x0) for (t, r, b, l) in locs]
+
+
+def _encode_crop(job):
+    crop_np, loc, encoder = job
+    encs = encoder.encode(crop_np, [loc])
+    return encs[0] if len(encs) else None
+
+
+def _crop_around(img_np, box, margin=0.5):
+    """Crop with a margin so the landmark model sees the whole face; returns crop + local box."""
+    t, r, b, l = box
+    h, w = img_np.shape[:2]
+    my, mx = int((b - t) * margin), int((r - l) * margin)
+    y0, x0 = max(0, t - my), max(0, l - mx)
+    y1, x1 = min(h, b + my), min(w, r + mx)
+    crop = np.ascontiguousarray(img_np[y0:y1, x0:x1])
+    return crop, (t - y0, r - x0, b - y0, l - x0)
+
+
+# ---------------- Tiled Pipeline ----------------
+def detect_and_encode_tiled(img_np, detector=None, encoder=None, tile=TILE_SIZE, overlap=TILE_OVERLAP,
+                            workers=None, timings=None):
+    """Detect per tile and encode per face across all cores."""
+    detector, encoder = get_detector(detector), get_encoder(encoder)
+    pool = _get_pool(workers)
+    h, w = img_np.shape[:2]
+
+    with _Stage(timings, "detect"):
+        jobs = [(np.ascontiguousarray(img_np[y0:y1, x0:x1]), y0, x0, detector)
+                for (y0, x0, y1, x1) in tile_grid(h, w, tile, overlap)]
+        boxes = [b for found in pool.map(_detect_tile, jobs) for b in found]
+        locs = merge_boxes(boxes)
+
+    with _Stage(timings, "encode"):
+        encs = list(pool.map(_encode_crop, [_crop_around(img_np, loc) + (encoder,) for loc in locs]))
+    kept = [(loc, enc) for loc, enc in zip(locs, encs) if enc is not None]
+    return [k[0] for k in kept], [k[1] for k in kept]
+
+
+# ---------------- Auto ----------------
+def detect_and_encode_auto(img_np, detector=None, encoder=None, timings=None):
+    """
+    Downscaled detection first; its boxes are encoded only when every face is well above
+    the floor. No face or a near-floor face → the tiled pass instead (nothing encoded twice).
+    """
+    detector, encoder = get_detector(detector), get_encoder(encoder)
+    locs = _downscaled_locations(img_np, detector, timings=timings)
+    small = [loc for loc in locs if min(loc[2] - loc[0], loc[1] - loc[3]) < AUTO_TILE_FACE_PX]
+    if locs and not small:
+        with _Stage(timings, "encode"):
+            encs = encoder.encode(img_np, locs)
+        return locs, encs
+    tracing.count("tiled_fallback")
+    return detect_and_encode_tiled(img_np, detector, encoder, timings=timings)
+
+
+STRATEGIES = {
+    "single": detect_and_encode,
+    "tiled": detect_and_encode_tiled,
+    "downscale": detect_and_encode_downscaled,
+    "auto": detect_and_encode_auto,
+}
+
+
+def detect_faces(img_np, strategy=None, detector=None, encoder=None, timings=None):
+    """
+    strategy=None → LARGE_PHOTO_STRATEGY above LARGE_PHOTO_MIN_PIXELS, else "single"
+    strategy="single" | "tiled" | "downscale" | "auto" to force one
+    detector/encoder → backend names or instances (utils/face_backends)
+    """
+    if strategy is None:
+        large = img_np.shape[0] * img_np.shape[1] >= LARGE_PHOTO_MIN_PIXELS
+        strategy = LARGE_PHOTO_STRATEGY if large else "single"
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown detection strategy: {strategy}")
+    tracing.annotate(strategy=strategy)
+
+    return STRATEGIES[strategy](img_np, detector=detector, encoder=encoder, timings=timings)
@@ -0,0 +1,252 @@
+# utils/face_index.py
+#
+# Nearest-neighbour indexes for the known-faces gallery.
+#   BruteForceIndex → exact scan, used for class-sized galleries
+#   IVFIndex        → k-means partitioned (inverted file) index for very large
+#                     galleries; pure NumPy, persisted next to attendance.db
+#
+# Both expose search(queries, k) → (keys, dists), sorted nearest first.
+
+import os
+import numpy as np
+
+from utils.database import DB_PATH
+
+ENCODING_DIM = 128
+INDEX_PATH = os.path.join(os.path.dirname(DB_PATH), "face_index.npz")
+
+# Galleries smaller than this are always scanned exactly
+IVF_MIN_GALLERY = 20000
+# Recall / latency knobs: more lists probed → higher recall, slower search
+IVF_NPROBE = 8
+IVF_TRAIN_ITERS = 12
+# Centroids are retrained once this fraction of the gallery has been added /
+# removed since training; below it new faces just join their nearest bucket
+IVF_RETRAIN_DRIFT = 0.2
+# Edits are written to disk at most this often (and when the app exits)
+IVF_SAVE_INTERVAL_S = 300
+
+
+def pairwise_distances(face_encs, known_encs):
+    """Euclidean distances for every (face, known) pair in one matrix op → shape (F, G)."""
+    faces = np.asarray(face_encs, dtype=np.float64).reshape(-1, ENCODING_DIM)
+    known = np.asarray(known_encs, dtype=np.float64).reshape(-1, ENCODING_DIM)
+
+    sq = (
+        np.einsum("ij,ij->i", faces, faces)[:, None]
+        + np.einsum("ij,ij->i", known, known)[None, :]
+        - 2.0 * faces @ known.T
+    )
+    np.maximum(sq, 0.0, out=sq)
+    return np.sqrt(sq)
+
+
+def _top_k(dist, k):
+    """Column indices of the k smallest entries per row, nearest first."""
+    k = min(k, dist.shape[1])
+    if k < dist.shape[1]:
+        part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(k), (dist.shape[0], k))
+    order = np.take_along_axis(dist, part, axis=1).argsort(axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+# ---------------- Exact ----------------
+class BruteForceIndex:
+    def __init__(self, matrix, keys=None):
+        self.matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        self.keys = list(range(len(self.matrix))) if keys is None else list(keys)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def search(self, queries, k=5):
+        n = len(queries)
+        if n == 0 or len(self.matrix) == 0:
+            return np.full((n, 0), None, dtype=object), np.empty((n, 0))
+
+        dist = pairwise_distances(queries, self.matrix)
+        cols = _top_k(dist, k)
+        keys = np.empty(cols.shape, dtype=object)
+        keys[:] = [[self.keys[c] for c in row] for row in cols]
+        return keys, np.take_along_axis(dist, cols, axis=1)
+
+
+# ---------------- Partitioned (IVF) ----------------
+def _kmeans(data, k, iters=IVF_TRAIN_ITERS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = pairwise_distances(data, centroids).argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are bucketed under their nearest k-means
+    centroid and a query only scans the nprobe closest buckets.
+    Adds/removes touch a single bucket, so student edits never force a retrain;
+    drifted() says when enough has changed that the centroids should be retrained.
+    """
+
+    def __init__(self, centroids, nprobe=None, trained_on=0, drift=0):
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.nprobe = nprobe or IVF_NPROBE
+        self._keys = [[] for _ in range(len(self.centroids))]
+        self._vecs = [np.empty((0, ENCODING_DIM)) for _ in range(len(self.centroids))]
+        self._where = {}     # key → (list, position)
+        self.trained_on = trained_on    # gallery size the centroids were trained on
+        self.drift = drift              # vectors added / removed since training
+        self.dirty = False              # changed since the last save
+
+    @classmethod
+    def train(cls, matrix, keys, nlist=None, nprobe=None):
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if nlist is None:
+            nlist = int(4 * np.sqrt(len(matrix)))
+        nlist = max(1, min(nlist, len(matrix)))
+
+        # Training on a sample keeps k-means cost bounded for huge galleries
+        sample = matrix
+        if len(matrix) > 256 * nlist:
+            sample = matrix[np.random.default_rng(0).choice(len(matrix), 256 * nlist, replace=False)]
+
+        index = cls(_kmeans(sample, nlist), nprobe=nprobe, trained_on=len(matrix))
+        index.add_many(keys, matrix)
+        index.dirty = True
+        return index
+
+    def __len__(self):
+        return len(self._where)
+
+    def add_many(self, keys, matrix):
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if len(matrix) == 0:
+            return
+        assign = pairwise_distances(matrix, self.centroids).argmin(axis=1)
+        for lst in np.unique(assign):
+            sel = np.flatnonzero(assign == lst)
+            base = len(self._keys[lst])
+            self._vecs[lst] = np.vstack([self._vecs[lst], matrix[sel]])
+            for j, i in enumerate(sel):
+                self._keys[lst].append(keys[i])
+                self._where[keys[i]] = (int(lst), base + j)
+
+    def drifted(self):
+        return self.drift > IVF_RETRAIN_DRIFT * max(self.trained_on, 1)
+
+    def add(self, key, vec):
+        self._remove(key)
+        self.add_many([key], vec)
+        self.drift += 1
+        self.dirty = True
+
+    def remove(self, key):
+        if self._remove(key):
+            self.drift += 1
+            self.dirty = True
+
+    def _remove(self, key):
+        loc = self._where.pop(key, None)
+        if loc is None:
+            return False
+        lst, pos = loc
+        keys, vecs = self._keys[lst], self._vecs[lst]
+        last = len(keys) - 1
+        if pos != last:
+            keys[pos] = keys[last]
+            vecs[pos] = vecs[last]
+            self._where[keys[pos]] = (lst, pos)
+        keys.pop()
+        self._vecs[lst] = vecs[:last]
+        return True
+
+    def search(self, queries, k=5):
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        n = len(queries)
+        keys_out = np.full((n, k), None, dtype=object)
+        dist_out = np.full((n, k), np.inf)
+        if n == 0 or not self._where:
+            return keys_out, dist_out
+
+        probe = _top_k(pairwise_distances(queries, self.centroids), self.nprobe)
+        for q in range(n):
+            lists = [l for l in probe[q] if self._keys[l]]
+            if not lists:
+                continue
+            cand = np.vstack([self._vecs[l] for l in lists])
+            cand_keys = [key for l in lists for key in self._keys[l]]
+
+            dist = pairwise_distances(queries[q:q + 1], cand)
+            cols = _top_k(dist, k)[0]
+            keys_out[q, :len(cols)] = [cand_keys[c] for c in cols]
+            dist_out[q, :len(cols)] = dist[0, cols]
+
+        return keys_out, dist_out
+
+    # ---------------- Persistence ----------------
+    def save(self, path=None):
+        path = path or INDEX_PATH
+        keys = [key for lst in self._keys for key in lst]
+        lists = [i for i, lst in enumerate(self._keys) for _ in lst]
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, keys=np.array(keys, dtype=str),
+                 lists=np.array(lists, dtype=np.int64), trained_on=self.trained_on, drift=self.drift)
+        os.replace(tmp, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, matrix, keys, path=None):
+        """
+        Restore centroids and bucket assignments from disk and fill the buckets
+        from the in-memory gallery. Keys not in the saved file are assigned fresh.
+        Returns None when there is no usable index on disk.
+        """
+        path = path or INDEX_PATH
+        if not os.path.exists(path):
+            return None
+        try:
+            data = np.load(path)
+            saved = dict(zip(data["keys"].tolist(), data["lists"].tolist()))
+            # files written before drift tracking count as freshly trained
+            trained_on = int(data["trained_on"]) if "trained_on" in data else len(saved)
+            index = cls(data["centroids"], trained_on=trained_on,
+                        drift=int(data["drift"]) if "drift" in data else 0)
+        except Exception as e:
+            print(f"⚠ Ignoring unreadable face index {path} → {e}")
+            return None
+
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        fresh_keys, fresh_rows = [], []
+        by_list = {}
+        for i, key in enumerate(keys):
+            lst = saved.get(key)
+            if lst is None or lst >= len(index.centroids):
+                fresh_keys.append(key)
+                fresh_rows.append(i)
+            else:
+                by_list.setdefault(lst, []).append(i)
+
+        for lst, rows in by_list.items():
+            index._vecs[lst] = matrix[rows].copy()
+            index._keys[lst] = [keys[i] for i in rows]
+            for pos, i in enumerate(rows):
+                index._where[keys[i]] = (lst, pos)
+
+        index.add_many(fresh_keys, matrix[fresh_rows])
+        # faces enrolled or removed while the file was stale
+        changed = len(fresh_keys) + max(0, len(saved) - (len(keys) - len(fresh_keys)))
+        index.drift += changed
+        index.dirty = changed > 0
+        return index
@@ -0,0 +1,89 @@
+# utils/face_quality.py
+#
+# Quality gate for enrollment photos. Each detected face gets a score in
+# [0, 1] from three checks; a face failing any hard limit is rejected.
+#   size  → shorter box side in px (tiny faces give unstable encodings)
+#   blur  → variance of the Laplacian on the face crop scaled to BLUR_CROP_PX
+#   pose  → yaw / roll from the 5-point landmarks (nose vs. eye midpoint, eye line)
+#
+# Thresholds are module constants so they can be tuned per camera.
+
+import numpy as np
+from PIL import Image
+
+MIN_FACE_PX = 60
+GOOD_FACE_PX = 160
+
+BLUR_CROP_PX = 128
+MIN_SHARPNESS = 40.0
+GOOD_SHARPNESS = 250.0
+
+# |nose offset from eye midpoint| / eye distance; ~0 frontal, >0.5 near profile
+MAX_YAW = 0.35
+MAX_ROLL_DEG = 25.0
+
+
+def _ramp(value, low, high):
+    return float(np.clip((value - low) / float(high - low), 0.0, 1.0))
+
+
+def face_size(loc):
+    top, right, bottom, left = loc
+    return min(bottom - top, right - left)
+
+
+def sharpness(img_np, loc):
+    """Variance of the 4-neighbour Laplacian on the grey face crop (higher = sharper)."""
+    top, right, bottom, left = loc
+    crop = Image.fromarray(img_np[max(0, top):bottom, max(0, left):right]).convert("L")
+    g = np.asarray(crop.resize((BLUR_CROP_PX, BLUR_CROP_PX), Image.BILINEAR), dtype=np.float64)
+    lap = g[:-2, 1:-1] + g[2:, 1:-1] + g[1:-1, :-2] + g[1:-1, 2:] - 4.0 * g[1:-1, 1:-1]
+    return float(lap.var())
+
+
+def pose(landmarks):
+    """(yaw, roll_deg) from a face_recognition "small" landmark dict, or None."""
+    try:
+        left = np.mean(landmarks["left_eye"], axis=0)
+        right = np.mean(landmarks["right_eye"], axis=0)
+        nose = np.mean(landmarks["nose_tip"], axis=0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    eyes = right - left
+    dist = float(np.hypot(*eyes))
+    if dist < 1.0:
+        return None
+    mid = (left + right) / 2.0
+    # nose offset along the eye line, relative to the eye distance
+    yaw = abs(float(np.dot(nose - mid, eyes / dist))) / dist
+    roll = abs(float(np.degrees(np.arctan2(eyes[1], eyes[0]))))
+    roll = min(roll, 180.0 - roll)
+    return yaw, roll
+
+
+def assess(img_np, loc, landmarks=None):
+    """
+    Score one face. Returns (score, reason): reason is None when the face passes
+    the gate, otherwise a short text ("face too small", "blurry", "not frontal").
+    Without landmarks the pose check is skipped.
+    """
+    size = face_size(loc)
+    if size < MIN_FACE_PX:
+        return 0.0, f"face too small ({size}px)"
+
+    sharp = sharpness(img_np, loc)
+    if sharp < MIN_SHARPNESS:
+        return 0.0, "blurry"
+
+    score = _ramp(size, MIN_FACE_PX, GOOD_FACE_PX) * 0.4 + 0.6
+    score *= _ramp(sharp, MIN_SHARPNESS, GOOD_SHARPNESS) * 0.5 + 0.5
+
+    angles = pose(landmarks) if landmarks else None
+    if angles is not None:
+        yaw, roll = angles
+        if yaw > MAX_YAW or roll > MAX_ROLL_DEG:
+            return 0.0, "not frontal"
+        score *= 1.0 - 0.5 * max(yaw / MAX_YAW, roll / MAX_ROLL_DEG)
+
+    return round(score, 4), None
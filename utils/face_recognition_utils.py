@@ -1,117 +1,78 @@
 # utils/face_recognition_utils.py
+#
+# App-wide recognition entry points, backed by one shared RecognitionEngine
+# (utils/recognition_engine.py). The backends come from the environment when
+# the engine is built (names as in utils/face_backends):
+#   SMARTSNAP_DETECTOR   hog | cnn | opencv-dnn (default hog)
+#   SMARTSNAP_ENCODER    dlib (default); changing it means re-enrolling everyone
+# or swap at runtime with set_engine, e.g.
+#   set_engine(RecognitionEngine(detector="cnn"))
 
-import face_recognition
-import numpy as np
-from PIL import Image
-import io
-import sqlite3
-import threading
-import time
-from utils.database import get_connection
+import os
 
-# ---------------- Cache ----------------
-_known_lock = threading.Lock()
-_known_encodings = []
-_known_prns = []
-_last_load_time = 0
+from utils.recognition_engine import (
+    ENCODING_DIM, RecognitionEngine, bytes_to_rgb_np, photo_hash, match_faces, roster_prns,
+)
 
 
-# ---------------- Image Conversion ----------------
-def bytes_to_rgb_np(image_bytes):
-    """Convert bytes → uint8 RGB NumPy array (dlib safe)"""
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    arr = np.asarray(img, dtype=np.uint8)
+def engine_from_env():
+    """A RecognitionEngine with the backends named by SMARTSNAP_DETECTOR / SMARTSNAP_ENCODER."""
+    return RecognitionEngine(
+        detector=os.environ.get("SMARTSNAP_DETECTOR") or "hog",
+        encoder=os.environ.get("SMARTSNAP_ENCODER") or "dlib",
+    )
 
-    if arr.ndim != 3 or arr.shape[2] != 3:
-        raise ValueError("Unsupported image format")
 
-    return arr
+engine = engine_from_env()
 
 
-# ---------------- Load Known Students ----------------
-def reload_known_students(force=False):
-    global _known_encodings, _known_prns, _last_load_time
-
-    with _known_lock:
-        if _known_encodings and not force:
-            return len(_known_encodings)
-
-        print("🔄 Reloading known student encodings...")
-
-        _known_encodings = []
-        _known_prns = []
-
-        conn = get_connection()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
+def get_engine():
+    return engine
 
-        cur.execute("SELECT prn, photo FROM students WHERE photo IS NOT NULL")
-        rows = cur.fetchall()
-        conn.close()
 
-        for r in rows:
-            try:
-                prn = str(r["prn"]).strip()
-                img_np = bytes_to_rgb_np(r["photo"])
+def set_engine(new_engine):
+    """Replace the shared engine; the new one loads its cache on first use."""
+    global engine
+    engine = new_engine
+    return engine
 
-                locs = face_recognition.face_locations(img_np, model="hog")
-                if not locs:
-                    continue
 
-                enc = face_recognition.face_encodings(img_np, locs)[0]
-                _known_encodings.append(enc)
-                _known_prns.append(prn)
+# ---------------- Encoding Store ----------------
+def encode_face(image_bytes):
+    """Return the 128-d encoding of the first face in a photo, or None."""
+    return engine.encode_photo(image_bytes)
 
-            except Exception as e:
-                print(f"❌ Encoding failed for PRN {r['prn']} → {e}")
 
-        _last_load_time = time.time()
-        print(f"✅ Loaded {_last_load_time} | Faces: {len(_known_encodings)}")
+def store_student_encoding(prn, photo_bytes, conn=None):
+    return engine.enroll(prn, photo_bytes, conn=conn)
 
-        return len(_known_encodings)
 
+def enroll_student_photos(prn, photos, conn=None):
+    """Extra enrollment photos → [(quality, reason), ...]; see RecognitionEngine.enroll_photos."""
+    return engine.enroll_photos(prn, photos, conn=conn)
 
-# ---------------- Recognize Students ----------------
-def recognize_students(image_bytes, tolerance=0.50):
-    """
-    Returns:
-        present_prns (list[str])
-        unknown_count (int)
-    """
-
-    # ALWAYS reload (important for attendance accuracy)
-    reload_known_students(force=True)
-
-    if not _known_encodings:
-        print("⚠ No known student faces loaded")
-        return [], 0
 
-    img_np = bytes_to_rgb_np(image_bytes)
+def backfill_face_encodings(progress=None):
+    """Encode students enrolled before encodings were stored; see RecognitionEngine.backfill."""
+    return engine.backfill(progress=progress)
 
-    face_locs = face_recognition.face_locations(img_np, model="hog")
-    face_encs = face_recognition.face_encodings(img_np, face_locs)
 
-    print(f"👥 Faces detected in group image: {len(face_encs)}")
+# ---------------- Load Known Students ----------------
+def mark_student_changed(prn):
+    engine.mark_changed(prn)
 
-    present = []
-    unknown = 0
 
-    for enc in face_encs:
-        distances = face_recognition.face_distance(_known_encodings, enc)
+def reload_known_students(force=False):
+    return engine.load(force=force)
 
-        best_idx = np.argmin(distances)
-        best_dist = float(distances[best_idx])
 
-        print(f"📏 Distance: {best_dist}")
+def refresh_known_students():
+    return engine.refresh()
 
-        if best_dist <= tolerance:
-            prn = _known_prns[best_idx]
-            present.append(prn)
-            print(f"✅ Recognized PRN: {prn}")
-        else:
-            unknown += 1
-            print("❓ Unknown face")
 
-    # Remove duplicates
-    present = list(dict.fromkeys(present))
-    return present, unknown
+# ---------------- Recognize Students ----------------
+def recognize_students(image_bytes, tolerance=0.50, class_name=None, division=None, fallback=False,
+                       strategy=None, progress=None):
+    """See RecognitionEngine.recognize. Returns (present_prns, unknown_count)."""
+    return engine.recognize(image_bytes, tolerance, class_name, division, fallback,
+                            strategy=strategy, progress=progress)
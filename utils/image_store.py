@@ -0,0 +1,200 @@
+# utils/image_store.py
+#
+# Optional content-addressed store for photo bytes, so the hot tables (students,
+# group_photos, attendance) only carry a short reference instead of BLOBs.
+# Opt in with SMARTSNAP_IMAGE_STORE:
+#   "files"  → images/<2 hex>/<sha256> next to attendance.db
+#   "sqlite" → images.db (separate file, never scanned by roster queries)
+#   unset / "inline" → keep BLOBs inline (default)
+#
+# References look like "sha256:<hex>". Readers go through load_bytes/open_stream,
+# which accept either an inline BLOB or a reference, so both layouts work side by side.
+#
+#   python -m utils.image_store --migrate     move existing BLOBs into the store
+
+import hashlib
+import io
+import os
+import sqlite3
+import sys
+import threading
+
+from utils import database
+
+BACKEND = os.environ.get("SMARTSNAP_IMAGE_STORE") or None
+if BACKEND == "inline":
+    BACKEND = None
+
+_REF_PREFIX = "sha256:"
+_local = threading.local()
+
+
+def _base_dir():
+    return os.path.dirname(database.DB_PATH)
+
+
+def enabled():
+    return BACKEND is not None
+
+
+def make_ref(data):
+    return _REF_PREFIX + hashlib.sha256(data).hexdigest()
+
+
+def _digest(ref):
+    if not ref or not ref.startswith(_REF_PREFIX):
+        raise ValueError(f"Not an image reference: {ref!r}")
+    return ref[len(_REF_PREFIX):]
+
+
+# ---------------- Files Backend ----------------
+def _file_path(digest):
+    return os.path.join(_base_dir(), "images", digest[:2], digest)
+
+
+def _files_put(digest, data):
+    path = _file_path(digest)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ---------------- SQLite Backend ----------------
+def _blob_path():
+    return os.path.join(_base_dir(), "images.db")
+
+
+def _blob_conn():
+    path = _blob_path()
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != path:
+        conn = sqlite3.connect(path, timeout=database.BUSY_TIMEOUT_S)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                id INTEGER PRIMARY KEY,
+                hash TEXT UNIQUE NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        _local.conn, _local.path = conn, path
+    return conn
+
+
+def _sqlite_put(digest, data):
+    conn = _blob_conn()
+    conn.execute("INSERT OR IGNORE INTO blobs(hash, data) VALUES (?, ?)", (digest, data))
+    conn.commit()
+
+
+# ---------------- Public API ----------------
+def put(data):
+    """Store bytes (idempotent) and return their reference."""
+    ref = make_ref(data)
+    if BACKEND == "sqlite":
+        _sqlite_put(_digest(ref), data)
+    else:
+        _files_put(_digest(ref), data)
+    return ref
+
+
+def open_stream(ref):
+    """Readable binary file object for a reference; nothing is loaded until read."""
+    digest = _digest(ref)
+
+    path = _file_path(digest)
+    if os.path.exists(path):
+        return open(path, "rb")
+
+    # a read never creates images.db (files / inline installs don't have one)
+    if not os.path.exists(_blob_path()):
+        raise FileNotFoundError(f"Image {ref} missing from store")
+    conn = _blob_conn()
+    row = conn.execute("SELECT id FROM blobs WHERE hash=?", (digest,)).fetchone()
+    if row is None:
+        raise FileNotFoundError(f"Image {ref} missing from store")
+    if hasattr(conn, "blobopen"):
+        return conn.blobopen("blobs", "data", row[0], readonly=True)
+    data = conn.execute("SELECT data FROM blobs WHERE id=?", (row[0],)).fetchone()[0]
+    return io.BytesIO(data)
+
+
+def load_bytes(blob=None, ref=None):
+    """Inline BLOB if present, otherwise read the referenced image; None if neither."""
+    if blob:
+        return bytes(blob)
+    if ref:
+        with open_stream(ref) as f:
+            return f.read()
+    return None
+
+
+def load_student_photo(prn):
+    """Full bytes of a student's main photo, or None."""
+    conn = database.get_connection()
+    try:
+        row = conn.execute("SELECT photo, photo_ref FROM students WHERE prn=?", (prn,)).fetchone()
+    finally:
+        conn.close()
+    return load_bytes(row[0], row[1]) if row else None
+
+
+def store_for_row(data):
+    """(blob, ref) pair to write into a row: inline when the store is off, reference otherwise."""
+    if not data:
+        return None, None
+    if not enabled():
+        return data, None
+    return None, put(data)
+
+
+# ---------------- Migration ----------------
+def migrate_blobs_to_store():
+    """
+    Move inline students.photo and group_photos.photo BLOBs into the store,
+    one row at a time, then VACUUM to give the space back.
+    Attendance copies are collapsed first (see database.migrate_attendance_photos).
+    """
+    if not enabled():
+        print("⚠ Image store is disabled; set SMARTSNAP_IMAGE_STORE=files or sqlite first.")
+        return 0
+
+    database.ensure_schema()
+    database.migrate_attendance_photos()
+
+    conn = database.get_connection()
+    moved = 0
+
+    prns = [r[0] for r in conn.execute(
+        "SELECT prn FROM students WHERE photo IS NOT NULL AND length(photo) > 0").fetchall()]
+    for prn in prns:
+        blob = conn.execute("SELECT photo FROM students WHERE prn=?", (prn,)).fetchone()[0]
+        conn.execute("UPDATE students SET photo=NULL, photo_ref=? WHERE prn=?", (put(blob), prn))
+        moved += 1
+        if moved % 200 == 0:
+            conn.commit()
+
+    # group_photos.photo is NOT NULL in older schemas → leave an empty BLOB behind
+    ids = [r[0] for r in conn.execute(
+        "SELECT id FROM group_photos WHERE length(photo) > 0").fetchall()]
+    for gid in ids:
+        blob = conn.execute("SELECT photo FROM group_photos WHERE id=?", (gid,)).fetchone()[0]
+        conn.execute("UPDATE group_photos SET photo=X'', photo_ref=? WHERE id=?", (put(blob), gid))
+        moved += 1
+        if moved % 200 == 0:
+            conn.commit()
+
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"🟢 Moved {moved} photo(s) into the {BACKEND} image store")
+    return moved
+
+
+if __name__ == "__main__":
+    if "--migrate" in sys.argv:
+        migrate_blobs_to_store()
@@ -0,0 +1,80 @@
+# utils/ingest.py
+#
+# Normalizes every photo entering the app (mobile uploads, student and
+# enrollment photos) in one decode:
+#   EXIF orientation applied → GPS read → longest side clamped → JPEG at QUALITY
+# Stored photos are then upright (a sideways phone photo finds no faces),
+# bounded in size and cheap to decode for recognition.
+#
+# Group photos get a much higher clamp than enrollment photos: back-row faces
+# need the pixels, and face_detection's large-photo strategies key off size.
+#
+#   SMARTSNAP_MAX_SIDE        enrollment photos, longest side in px (default 2048)
+#   SMARTSNAP_GROUP_MAX_SIDE  classroom photos (default 6000, 0 = no clamp)
+#   SMARTSNAP_JPEG_QUALITY    JPEG quality 1-95 (default 90)
+
+import io
+import os
+
+from PIL import Image, ImageOps
+
+MAX_SIDE = int(os.environ.get("SMARTSNAP_MAX_SIDE", "2048"))
+GROUP_MAX_SIDE = int(os.environ.get("SMARTSNAP_GROUP_MAX_SIDE", "6000"))
+QUALITY = int(os.environ.get("SMARTSNAP_JPEG_QUALITY", "90"))
+
+_GPS_IFD = 0x8825
+
+
+def _to_degrees(dms):
+    """(deg, min, sec) as rationals or (num, den) pairs → decimal degrees."""
+    def num(v):
+        return v[0] / v[1] if isinstance(v, tuple) else float(v)
+    d, m, s = (num(v) for v in dms)
+    return d + (m / 60.0) + (s / 3600.0)
+
+
+def gps_from_exif(exif):
+    """(lat, lon) from a PIL Exif object; either is None when missing."""
+    try:
+        gps = exif.get_ifd(_GPS_IFD)
+    except Exception:
+        return None, None
+
+    def coord(value_tag, ref_tag, negative):
+        try:
+            value = _to_degrees(gps[value_tag])
+        except Exception:
+            return None
+        return -value if gps.get(ref_tag) == negative else value
+
+    # GPSLatitudeRef=1, GPSLatitude=2, GPSLongitudeRef=3, GPSLongitude=4
+    return coord(2, 1, "S"), coord(4, 3, "W")
+
+
+def normalize(source, max_side=None, quality=None):
+    """
+    Decode a photo (file path or bytes) once and return (jpeg_bytes, lat, lon).
+    max_side defaults to MAX_SIDE; 0 keeps the full resolution.
+    Raises on unreadable images.
+    """
+    max_side = MAX_SIDE if max_side is None else max_side
+    quality = quality or QUALITY
+
+    img = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+    exif = img.getexif()
+    lat, lon = gps_from_exif(exif)
+
+    # JPEG: decode straight at a reduced scale when the photo is far above the clamp
+    w, h = img.size
+    scale = max_side / float(max(w, h)) if max_side else 1.0
+    if scale < 1:
+        img.draft("RGB", (int(w * scale) + 1, int(h * scale) + 1))
+
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    if max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    buf = io.BytesIO()
+    # no EXIF in the output: orientation is already applied, GPS is returned separately
+    img.save(buf, "JPEG", quality=quality, optimize=True)
+    return buf.getvalue(), lat, lon
@@ -0,0 +1,185 @@
+# utils/paged_table.py
+#
+# Treeview that pages through a query instead of loading every row.
+#   - keyset pagination: each page continues after the last key shown
+#     (WHERE (k1, k2) > (?, ?) ORDER BY k1, k2 LIMIT n), so a late page costs
+#     the same as the first one
+#   - the next page is fetched when the view nears the bottom, earlier pages are
+#     re-fetched near the top; at most max_pages pages live in the widget
+#   - a status line shows the visible range and the total row count
+#
+# Key columns must be NOT NULL and unique together (end with a primary key);
+# COALESCE nullable sort columns into an alias in the query.
+
+import tkinter as tk
+from tkinter import ttk
+
+from utils.database import get_connection
+
+PAGE_SIZE = 200
+MAX_PAGES = 5
+# Fraction of the scroll range from either end that triggers a fetch
+EDGE = 0.05
+
+
+class PagedTreeview(tk.Frame):
+    def __init__(self, parent, columns, page_size=PAGE_SIZE, max_pages=MAX_PAGES, bg="white", **tree_kw):
+        super().__init__(parent, bg=bg)
+        self.columns = tuple(columns)
+        self.page_size = page_size
+        self.max_pages = max(2, max_pages)
+
+        body = tk.Frame(self, bg=bg)
+        body.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(body, columns=self.columns, show="headings", **tree_kw)
+        self.vsb = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.vsb.pack(side="right", fill="y")
+        self.tree.pack(fill="both", expand=True)
+
+        self.status_var = tk.StringVar(value="")
+        tk.Label(self, textvariable=self.status_var, bg=bg, fg="#666", anchor="w").pack(fill="x", pady=(4, 0))
+
+        self.total = 0
+        self._query = None
+        self._reset_pages()
+
+    def _reset_pages(self):
+        self._pages = []          # [{"first": key, "last": key, "iids": [...]}] in display order
+        self._offset = 0          # absolute row number of the first loaded row
+        self._has_next = False
+        self._has_prev = False
+        self._pending = False
+
+    # ---------------- Public API ----------------
+    def set_query(self, sql, params=(), keys=("rowid",), values=None, count_sql=None):
+        """
+        Show the rows of `sql` (no ORDER BY / LIMIT) ordered by `keys`.
+        values(row) → tuple for the tree; defaults to the row's columns named like the tree's.
+        count_sql (same params) can replace the default COUNT(*) over the wrapped query.
+        """
+        self._query = {
+            "sql": sql, "params": tuple(params), "keys": tuple(keys),
+            "values": values or (lambda r: tuple(r[c] for c in self.columns)),
+            "count_sql": count_sql or f"SELECT COUNT(*) FROM ({sql})",
+        }
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        self._reset_pages()
+        if self._query is None:
+            return
+
+        conn = get_connection()
+        try:
+            self.total = conn.execute(self._query["count_sql"], self._query["params"]).fetchone()[0] or 0
+        finally:
+            conn.close()
+        self._load_next()
+        self.tree.yview_moveto(0)
+
+    def clear(self):
+        self._query = None
+        self.total = 0
+        self.tree.delete(*self.tree.get_children())
+        self._reset_pages()
+        self.status_var.set("")
+
+    # ---------------- Paging ----------------
+    def _fetch(self, after=None, before=None):
+        q = self._query
+        keys = ", ".join(q["keys"])
+        marks = ", ".join("?" * len(q["keys"]))
+        sql, params = f"SELECT * FROM ({q['sql']})", list(q["params"])
+        if after is not None:
+            sql += f" WHERE ({keys}) > ({marks})"
+            params += list(after)
+        elif before is not None:
+            sql += f" WHERE ({keys}) < ({marks})"
+            params += list(before)
+        order = " DESC" if before is not None else ""
+        sql += " ORDER BY " + ", ".join(k + order for k in q["keys"]) + " LIMIT ?"
+        params.append(self.page_size)
+
+        conn = get_connection()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return rows[::-1] if before is not None else rows
+
+    def _key(self, row):
+        return tuple(row[k] for k in self._query["keys"])
+
+    def _top_index(self):
+        n = len(self.tree.get_children())
+        return int(round(self.tree.yview()[0] * n)) if n else 0
+
+    def _load_next(self):
+        self._pending = False
+        after = self._pages[-1]["last"] if self._pages else None
+        rows = self._fetch(after=after)
+        self._has_next = len(rows) == self.page_size
+        if rows:
+            values = self._query["values"]
+            iids = [self.tree.insert("", "end", values=values(r)) for r in rows]
+            self._pages.append({"first": self._key(rows[0]), "last": self._key(rows[-1]), "iids": iids})
+
+            if len(self._pages) > self.max_pages:
+                top = self._top_index()
+                dropped = self._pages.pop(0)
+                self.tree.delete(*dropped["iids"])
+                self._offset += len(dropped["iids"])
+                self._has_prev = True
+                n = len(self.tree.get_children())
+                self.tree.yview_moveto(max(0, top - len(dropped["iids"])) / float(n))
+        self._update_status()
+
+    def _load_prev(self):
+        self._pending = False
+        if not self._pages:
+            return
+        rows = self._fetch(before=self._pages[0]["first"])
+        if not rows:
+            self._has_prev = False
+        else:
+            top = self._top_index()
+            values = self._query["values"]
+            iids = [self.tree.insert("", i, values=values(r)) for i, r in enumerate(rows)]
+            self._pages.insert(0, {"first": self._key(rows[0]), "last": self._key(rows[-1]), "iids": iids})
+            self._offset = max(0, self._offset - len(rows))
+            self._has_prev = self._offset > 0
+
+            if len(self._pages) > self.max_pages:
+                dropped = self._pages.pop()
+                self.tree.delete(*dropped["iids"])
+                self._has_next = True
+            n = len(self.tree.get_children())
+            self.tree.yview_moveto((top + len(rows)) / float(n))
+        self._update_status()
+
+    def _on_scroll(self, first, last):
+        self.vsb.set(first, last)
+        if self._pending or self._query is None:
+            return
+        if float(last) >= 1.0 - EDGE and self._has_next:
+            self._pending = True
+            self.after_idle(self._safe_load, self._load_next)
+        elif float(first) <= EDGE and self._has_prev:
+            self._pending = True
+            self.after_idle(self._safe_load, self._load_prev)
+
+    def _safe_load(self, load):
+        try:
+            load()
+        except Exception as e:
+            self._pending = False
+            print(f"❌ Page load failed → {e}")
+
+    def _update_status(self):
+        loaded = len(self.tree.get_children())
+        if not self.total:
+            self.status_var.set("No rows")
+        else:
+            self.status_var.set(f"Rows {self._offset + 1:,}–{self._offset + loaded:,} of {self.total:,}")
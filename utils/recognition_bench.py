@@ -0,0 +1,369 @@
+# utils/recognition_bench.py
+#
+# Benchmark for the recognition path on synthetic classrooms.
+#   - a throwaway attendance.db (plus image store / face index) in a temp dir
+#   - real faces come from fixture photos: a folder of one-face images
+#     (--faces DIR, file name = PRN) or, by default, the student photos in the
+#     live attendance.db (read only)
+#   - the gallery is padded to --gallery with random 128-d encodings, far
+#     apart from real faces, so matching cost scales without more fixtures
+#   - group photos are composited from the enrolled face photos on a grid,
+#     so every photo has a known ground truth
+#
+# Per snap it times decode / detect / encode / match (RecognitionEngine.recognize)
+# and persist (group photo + attendance upsert, as the teacher dashboard saves),
+# then reports p50 / p95 per stage, recall / precision and peak RSS. Each backend
+# runs in its own process so peak RSS is not shared between them.
+#
+#   python -m utils.recognition_bench --detector hog cnn --photos 10 --faces-per-photo 30 --out bench.json
+#   python -m utils.recognition_bench --baseline bench.json      exit 1 if a stage p95 regressed
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from utils import database, face_index, image_store, tracing
+from utils.database import get_connection, ensure_schema, store_group_photo, upsert_attendance
+
+STAGES = ["decode", "downscale", "detect", "encode", "match", "persist", "total"]
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# a stage regresses when its p95 grows by more than this fraction over the baseline
+MAX_REGRESSION = 0.25
+# stages faster than this (ms) are too noisy to compare
+MIN_COMPARE_MS = 5.0
+
+
+# ---------------- Fixtures ----------------
+def load_fixtures(faces_dir=None, limit=None):
+    """[(prn, photo_bytes)] from a folder of face photos, or from the live students table."""
+    fixtures = []
+    if faces_dir:
+        for name in sorted(os.listdir(faces_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in IMAGE_EXTS:
+                with open(os.path.join(faces_dir, name), "rb") as f:
+                    fixtures.append((stem, f.read()))
+            if limit and len(fixtures) >= limit:
+                break
+        return fixtures
+
+    if not os.path.exists(database.DB_PATH):
+        return fixtures
+    conn = get_connection()
+    try:
+        cur = conn.execute("""
+            SELECT prn, photo, photo_ref FROM students
+            WHERE photo IS NOT NULL OR photo_ref IS NOT NULL
+            ORDER BY prn
+        """)
+        for prn, blob, ref in cur:
+            data = image_store.load_bytes(blob, ref)
+            if data:
+                fixtures.append((str(prn).strip(), data))
+            if limit and len(fixtures) >= limit:
+                break
+    finally:
+        conn.close()
+    return fixtures
+
+
+def composite_group_photo(faces, rng, cell=200, quality=90):
+    """Paste face photos on a grid (slightly jittered in size/position) → JPEG bytes."""
+    cols = max(1, int(np.ceil(np.sqrt(len(faces) * 1.5))))
+    rows = max(1, int(np.ceil(len(faces) / cols)))
+    shade = rng.randint(90, 170)
+    canvas = Image.new("RGB", (cols * cell, rows * cell), (shade, shade, shade))
+
+    for i, data in enumerate(faces):
+        img = Image.open(io.BytesIO(data)).convert("RGB")
+        img.thumbnail((int(cell * rng.uniform(0.8, 0.95)),) * 2)
+        r, c = divmod(i, cols)
+        x = c * cell + rng.randint(0, cell - img.width)
+        y = r * cell + rng.randint(0, cell - img.height)
+        canvas.paste(img, (x, y))
+
+    buf = io.BytesIO()
+    canvas.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+# ---------------- Stats ----------------
+def summarize(samples):
+    """Seconds → {"n", "p50", "p95", "mean", "max"} in milliseconds."""
+    if not samples:
+        return None
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "n": int(ms.size),
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "mean": round(float(ms.mean()), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+def peak_rss_mb():
+    """(this process, waited-for children) peak resident set in MiB; None where unknown."""
+    if resource is not None:
+        # ru_maxrss is bytes on macOS, KiB elsewhere
+        scale = 1 if sys.platform == "darwin" else 1024
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        return round(own / 2 ** 20, 1), round(children / 2 ** 20, 1)
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1), None
+    except Exception:
+        return None, None
+
+
+# ---------------- Synthetic Classroom ----------------
+def _seed_database(engine, fixtures, gallery, rng):
+    """Students + encodings in the temp DB. Returns (enroll seconds per real student, real PRNs)."""
+    ensure_schema()
+    conn = get_connection()
+    conn.execute("INSERT INTO teachers(username, name, password) VALUES ('bench', 'Bench', '-')")
+    conn.execute("INSERT INTO subjects(name) VALUES ('Benchmark')")
+
+    for i, (prn, data) in enumerate(fixtures):
+        blob, ref = image_store.store_for_row(data)
+        conn.execute("""
+            INSERT INTO students(prn, roll_no, name, class, division, email, password, photo, photo_ref, photo_key)
+            VALUES (?, ?, ?, 'BENCH', 'A', '', '-', ?, ?, ?)
+        """, (prn, str(i + 1), prn, blob, ref, image_store.make_ref(data)))
+    conn.commit()
+
+    enroll = []
+    enrolled = []
+    for prn, data in fixtures:
+        t0 = time.perf_counter()
+        ok = engine.enroll(prn, data, conn=conn)
+        enroll.append(time.perf_counter() - t0)
+        if ok:
+            enrolled.append(prn)
+
+    # Padding identities: random vectors ~1.4 apart, well outside any match tolerance
+    pad = max(0, gallery - len(enrolled))
+    np_rng = np.random.default_rng(rng.randint(0, 2 ** 31))
+    for start in range(0, pad, 5000):
+        batch = range(start, min(pad, start + 5000))
+        vecs = np_rng.normal(0.0, 0.09, size=(len(batch), 128))
+        conn.executemany("""
+            INSERT INTO students(prn, roll_no, name, class, division, email, password, photo)
+            VALUES (?, ?, ?, 'BENCH', 'Z', '', '-', x'')
+        """, [(f"SYN{j:07d}", str(j), "synthetic") for j in batch])
+        conn.executemany(
+            "INSERT INTO face_encodings(prn, photo_hash, encoding) VALUES (?, '', ?)",
+            [(f"SYN{j:07d}", v.tobytes()) for j, v in zip(batch, vecs)]
+        )
+        conn.commit()
+    conn.close()
+    return enroll, enrolled
+
+
+def _persist(photo_bytes, roster, present, day):
+    ensure_schema()
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        group_photo_id = store_group_photo(cur, photo_bytes, 1, 1, "BENCH", "A", day, "09:00:00")
+        hits = set(present)
+        upsert_attendance(cur, [(p, "Present" if p in hits else "Absent") for p in roster],
+                          1, 1, day, "09:00:00", group_photo_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def run_backend(detector, fixtures, gallery=1000, photos=10, faces_per_photo=30, cell=200,
+                strategy=None, tolerance=0.50, seed=0, quiet=True, keep=False):
+    """Benchmark one detector backend in a fresh temp database. Returns a result dict."""
+    from utils.recognition_engine import RecognitionEngine
+
+    rng = random.Random(seed)
+    workdir = tempfile.mkdtemp(prefix="smartsnap-bench-")
+    live_db, live_index = database.DB_PATH, face_index.INDEX_PATH
+    database.DB_PATH = os.path.join(workdir, "attendance.db")
+    face_index.INDEX_PATH = os.path.join(workdir, "face_index.npz")
+    log = io.StringIO() if quiet else sys.stdout
+    # stage numbers come from the timings dict; keep traces in memory only
+    tracing.set_sinks([tracing.RingBufferSink()] + ([] if quiet else [tracing.ConsoleSink()]))
+
+    try:
+        with redirect_stdout(log):
+            engine = RecognitionEngine(detector=detector, strategy=strategy)
+            enroll, enrolled = _seed_database(engine, fixtures, gallery, rng)
+
+            t0 = time.perf_counter()
+            known = engine.load(force=True)
+            load_s = time.perf_counter() - t0
+
+            by_prn = dict(fixtures)
+            samples = {s: [] for s in STAGES}
+            tp = fp = fn = 0
+            photo_px = None
+            start = date(2000, 1, 1)
+
+            for i in range(photos if enrolled else 0):
+                truth = rng.sample(enrolled, min(faces_per_photo, len(enrolled)))
+                photo = composite_group_photo([by_prn[p] for p in truth], rng, cell)
+                photo_px = list(Image.open(io.BytesIO(photo)).size)
+
+                timings = {}
+                t_all = time.perf_counter()
+                present, unknown = engine.recognize(photo, tolerance, strategy=strategy, timings=timings)
+
+                t0 = time.perf_counter()
+                _persist(photo, enrolled, present, (start + timedelta(days=i)).isoformat())
+                timings["persist"] = time.perf_counter() - t0
+                timings["total"] = time.perf_counter() - t_all
+
+                for stage, secs in timings.items():
+                    samples.setdefault(stage, []).append(secs)
+                found = set(present)
+                tp += len(found & set(truth))
+                fp += len(found - set(truth))
+                fn += len(set(truth) - found)
+
+        own_rss, child_rss = peak_rss_mb()
+        return {
+            "detector": getattr(engine.detector, "name", str(detector)),
+            "encoder": getattr(engine.encoder, "name", None),
+            "strategy": strategy,
+            "photo_px": photo_px,
+            "fixtures": len(fixtures),
+            "enrolled": len(enrolled),
+            "gallery": known,
+            "load_ms": round(load_s * 1000.0, 2),
+            "enroll": summarize(enroll),
+            "stages": {s: summarize(v) for s, v in samples.items() if v},
+            "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+            "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+            "peak_rss_mb": own_rss,
+            "peak_rss_children_mb": child_rss,
+        }
+    finally:
+        database.close_thread_connection()
+        database.DB_PATH, face_index.INDEX_PATH = live_db, live_index
+        if keep:
+            print(f"🗂 Benchmark data kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ---------------- Compare ----------------
+def compare(results, baseline, max_regression=MAX_REGRESSION):
+    """Stage p95 deltas against an earlier run → list of (detector, stage, old, new, ratio, regressed)."""
+    old = {(r["detector"], r.get("strategy")): r for r in baseline.get("results", [])}
+    rows = []
+    for r in results:
+        ref = old.get((r["detector"], r.get("strategy")))
+        if not ref:
+            continue
+        for stage, stats in r["stages"].items():
+            before = (ref["stages"].get(stage) or {}).get("p95")
+            if not before or not stats:
+                continue
+            ratio = stats["p95"] / before
+            regressed = ratio > 1 + max_regression and stats["p95"] >= MIN_COMPARE_MS
+            rows.append((r["detector"], stage, before, stats["p95"], ratio, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.recognition_bench",
+                                     description="Benchmark face recognition on synthetic classrooms.")
+    parser.add_argument("--detector", nargs="+", default=["hog"], help="hog, cnn, opencv-dnn (one run each)")
+    parser.add_argument("--strategy", default=None, help="single, downscale, tiled, auto (default: by photo size)")
+    parser.add_argument("--faces", default=None, help="folder of one-face photos (default: live students)")
+    parser.add_argument("--students", type=int, default=200, help="real identities to enroll")
+    parser.add_argument("--gallery", type=int, default=1000, help="known faces incl. synthetic padding")
+    parser.add_argument("--photos", type=int, default=10, help="group photos per backend")
+    parser.add_argument("--faces-per-photo", type=int, default=30)
+    parser.add_argument("--cell", type=int, default=200, help="grid cell per face (px)")
+    parser.add_argument("--tolerance", type=float, default=0.50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    parser.add_argument("--verbose", action="store_true", help="show the engine's own log")
+    parser.add_argument("--keep", action="store_true", help="keep the temp database")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.faces, args.students)
+    if not fixtures:
+        print("❌ No face fixtures: pass --faces DIR or enroll student photos first")
+        return 2
+    print(f"🧪 {len(fixtures)} face fixture(s), gallery {args.gallery}, "
+          f"{args.photos} photo(s) x {args.faces_per_photo} face(s)")
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for detector in args.detector:
+        # one process per backend, so peak RSS and warm caches are not shared
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            result = pool.submit(
+                run_backend, detector, fixtures, args.gallery, args.photos, args.faces_per_photo,
+                args.cell, args.strategy, args.tolerance, args.seed, not args.verbose, args.keep
+            ).result()
+        results.append(result)
+
+        print(f"\n== {result['detector']} | gallery {result['gallery']} | "
+              f"recall {result['recall']} | precision {result['precision']} | "
+              f"peak RSS {result['peak_rss_mb']} MiB ==")
+        for stage in STAGES:
+            stats = result["stages"].get(stage)
+            if stats:
+                print(f"  {stage:<10} p50 {stats['p50']:>9.1f} ms   p95 {stats['p95']:>9.1f} ms")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(),
+                 "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "verbose", "keep")},
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n🟢 Results written to {args.out}")
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(results, json.load(f), args.max_regression)
+        print("\n== vs baseline (p95) ==")
+        for detector, stage, before, after, ratio, regressed in rows:
+            flag = "  ❌ REGRESSED" if regressed else ""
+            print(f"  {detector:<10} {stage:<10} {before:>9.1f} → {after:>9.1f} ms ({ratio:.2f}x){flag}")
+            if regressed:
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
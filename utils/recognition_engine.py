@@ -0,0 +1,686 @@
+# utils/recognition_engine.py
+#
+# One recognition engine: the known-faces cache plus load / match / enroll,
+# with the detector and encoder picked from utils/face_backends.
+#
+#   engine = RecognitionEngine(detector="cnn")
+#   engine.enroll(prn, photo_bytes)          encode once, persist in face_encodings
+#   engine.enroll_photos(prn, [more, ...])   extra graded photos; best K kept as templates
+#   engine.load()                            incremental refresh of the cache
+#   present, unknown = engine.recognize(group_photo_bytes, class_name=..., division=...)
+#
+# The app shares a single engine through utils/face_recognition_utils.
+# Snaps and cache loads are recorded as traces (utils/tracing), not printed.
+
+import atexit
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils.database import get_connection, ensure_schema
+from utils import face_index, face_quality, image_store, tracing
+from utils.face_backends import get_detector, get_encoder
+from utils.face_detection import detect_faces
+from utils.face_index import BruteForceIndex, IVFIndex
+
+ENCODING_DIM = 128
+
+# Best accepted enrollment photos kept per student (utils/face_quality grades them)
+TEMPLATES_PER_STUDENT = 3
+# "templates" → nearest of a student's templates, "centroid" → their mean
+GALLERY_MODE = "templates"
+
+# face_encoding_changes rows kept; a process further behind than this reloads fully
+CHANGE_LOG_KEEP = 10000
+# PRNs per IN (...) list, well under SQLite's bound-variable limit
+SQL_CHUNK = 500
+
+
+# ---------------- Image Conversion ----------------
+def bytes_to_rgb_np(image_bytes):
+    """Convert bytes → uint8 RGB NumPy array (dlib safe)"""
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    arr = np.asarray(img, dtype=np.uint8)
+
+    if arr.ndim != 3 or arr.shape[2] != 3:
+        raise ValueError("Unsupported image format")
+
+    return arr
+
+
+def photo_hash(photo_bytes):
+    return hashlib.sha256(photo_bytes).hexdigest()
+
+
+# ---------------- Batch Matching ----------------
+def match_faces(face_encs, gallery, tolerance=0.50, candidates=5, exclude=None, owner=None):
+    """
+    Match every detected face against the gallery at once and assign
+    one-to-one: pairs are taken in order of increasing distance, so when two
+    faces claim the same student the closer one wins and the other falls back
+    to its next candidate (or stays unknown).
+
+    gallery is a matrix (keys = row numbers) or any index with search(queries, k).
+    owner maps a gallery key to the identity it belongs to (several template
+    rows per student); exclude is a set of identities that must not be assigned.
+
+    Returns:
+        best_keys (list)              identity per face, None if unmatched
+        best_dist (np.ndarray[float]) distance of the assigned/nearest key
+        conflicts (int)               faces that lost their nearest identity to a closer face
+    """
+    if not hasattr(gallery, "search"):
+        gallery = BruteForceIndex(gallery)
+    owner = owner or (lambda key: key)
+
+    n_faces = len(face_encs)
+    best_keys = [None] * n_faces
+    best_dist = np.full(n_faces, np.inf)
+
+    if n_faces == 0 or len(gallery) == 0:
+        return best_keys, best_dist, 0
+
+    k = candidates + (len(exclude) if exclude else 0)
+    keys, dist = gallery.search(face_encs, k)
+
+    faces, ranks = np.nonzero(dist <= tolerance)
+    order = np.argsort(dist[faces, ranks], kind="stable")
+
+    taken = set(exclude or ())
+    for f, r in zip(faces[order], ranks[order]):
+        ident = owner(keys[f, r])
+        if best_keys[f] is not None or ident in taken:
+            continue
+        best_keys[f] = ident
+        best_dist[f] = dist[f, r]
+        taken.add(ident)
+
+    conflicts = 0
+    for f in range(n_faces):
+        if best_keys[f] is None and dist.shape[1]:
+            best_dist[f] = dist[f, 0]
+        if dist.shape[1] and dist[f, 0] <= tolerance:
+            nearest = owner(keys[f, 0])
+            if best_keys[f] != nearest and nearest not in (exclude or ()):
+                conflicts += 1
+
+    return best_keys, best_dist, conflicts
+
+
+# ---------------- Gallery Scope ----------------
+def roster_prns(class_name, division):
+    """PRNs enrolled in one class/division (same columns load_filtered_students uses)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT prn FROM students WHERE class=? AND division=?", (class_name, division))
+    prns = [str(r[0]).strip() for r in cur.fetchall()]
+    conn.close()
+    return prns
+
+
+def _change_window(cur):
+    """(oldest, newest) seq in face_encoding_changes; newest is the sync watermark."""
+    cur.execute("SELECT MIN(seq), MAX(seq) FROM face_encoding_changes")
+    oldest, newest = cur.fetchone()
+    return oldest, newest or 0
+
+
+def _load_rows(cur, prns=None):
+    # a usable encoding is enough: it may come from extra enrollment photos alone
+    sql = """
+        SELECT f.prn, f.encoding FROM face_encodings f
+        JOIN students s ON s.prn = f.prn
+        WHERE length(f.encoding) > 0
+    """
+    if prns is None:
+        cur.execute(sql)
+        return cur.fetchall()
+
+    prns, rows = list(prns), []
+    for i in range(0, len(prns), SQL_CHUNK):
+        chunk = prns[i:i + SQL_CHUNK]
+        cur.execute(sql + f" AND f.prn IN ({','.join('?' * len(chunk))})", chunk)
+        rows.extend(cur.fetchall())
+    return rows
+
+
+def unpack_encodings(blob):
+    """face_encodings.encoding → (K, 128) array; one row for single-photo enrollments."""
+    return np.frombuffer(blob, dtype=np.float64).reshape(-1, ENCODING_DIM)
+
+
+def _pack_templates(cur, prn, primary_hash):
+    """
+    Rewrite face_encodings for one PRN from its best accepted templates.
+    When no photo passes the quality gate the best face found is kept anyway,
+    so a student with only poor photos is still recognisable.
+    """
+    cur.execute("""
+        SELECT encoding FROM face_templates
+        WHERE prn=? AND length(encoding) > 0 AND reason IS NULL
+        ORDER BY quality DESC, source='primary' DESC LIMIT ?
+    """, (prn, TEMPLATES_PER_STUDENT))
+    encs = [r[0] for r in cur.fetchall()]
+    if not encs:
+        cur.execute("""
+            SELECT encoding FROM face_templates
+            WHERE prn=? AND length(encoding) > 0
+            ORDER BY quality DESC, source='primary' DESC LIMIT 1
+        """, (prn,))
+        encs = [r[0] for r in cur.fetchall()]
+
+    # An empty encoding marks "no face in this photo" so it is not retried on every load
+    blob = b"".join(encs)
+    cur.execute("""
+        INSERT INTO face_encodings(prn, photo_hash, encoding)
+        VALUES (?, ?, ?)
+        ON CONFLICT(prn) DO UPDATE SET
+            photo_hash=excluded.photo_hash,
+            encoding=excluded.encoding,
+            created_at=datetime('now')
+    """, (prn, primary_hash, blob))
+    return bool(blob)
+
+
+class RecognitionEngine:
+    """
+    detector     → "hog" | "cnn" | "opencv-dnn" or a backend instance
+    encoder      → "dlib" or a backend instance
+    strategy     → default detection strategy (utils/face_detection), None = by photo size
+    gallery_mode → "templates": one gallery row per stored template, a face matches
+                   a student through the nearest of them
+                   "centroid": one row per student, the mean of the templates
+    """
+
+    def __init__(self, detector="hog", encoder="dlib", strategy=None, gallery_mode=GALLERY_MODE):
+        self.detector = get_detector(detector)
+        self.encoder = get_encoder(encoder)
+        self.strategy = strategy
+        self.gallery_mode = gallery_mode
+
+        self._lock = threading.RLock()
+        self._buffer = np.empty((64, ENCODING_DIM), dtype=np.float64)
+        self.encodings = self._buffer[:0]     # view over the filled rows of _buffer
+        self.keys = []                        # gallery key per row: the PRN, or PRN + template no.
+        self._rows = {}                       # prn → rows in encodings
+        self._owner = {}                      # template key → prn (keys other than the PRN itself)
+        self._pending = set()                 # PRNs edited in-process since last refresh
+        self._version = None                  # face_encoding_changes seq at last sync
+        self.ann_index = None                 # IVFIndex once the cache reaches face_index.IVF_MIN_GALLERY
+        self._index_saved_at = None           # time.monotonic() of the last index save
+        atexit.register(self.flush_index)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def owner(self, key):
+        return self._owner.get(key, key)
+
+    # ---------------- Enroll ----------------
+    def encode_photo(self, image_bytes):
+        """Return the encoding of the first face in a photo, or None."""
+        img_np = bytes_to_rgb_np(image_bytes)
+
+        locs = self.detector.locate(img_np)
+        if not locs:
+            return None
+
+        return self.encoder.encode(img_np, locs[:1])[0]
+
+    def score_photo(self, image_bytes):
+        """
+        Encode the largest face in an enrollment photo and grade it (utils/face_quality).
+        Returns (encoding or None, quality, reason); reason is None when the face passes the gate.
+        """
+        img_np = bytes_to_rgb_np(image_bytes)
+        locs = self.detector.locate(img_np)
+        if not locs:
+            return None, 0.0, "no face"
+
+        loc = max(locs, key=face_quality.face_size)
+        marks = None
+        if hasattr(self.encoder, "face_landmarks"):
+            marks = (self.encoder.face_landmarks(img_np, [loc]) or [None])[0]
+        quality, reason = face_quality.assess(img_np, loc, marks)
+        return self.encoder.encode(img_np, [loc])[0], quality, reason
+
+    def _store_template(self, cur, prn, photo_bytes, source):
+        digest = photo_hash(photo_bytes)
+        enc, quality, reason = self.score_photo(photo_bytes)
+        if enc is None:
+            tracing.count("no_face")
+        elif reason:
+            tracing.count("rejected")
+        cur.execute("""
+            INSERT INTO face_templates(prn, photo_hash, source, encoding, quality, reason)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(prn, photo_hash) DO UPDATE SET
+                source=excluded.source,
+                encoding=excluded.encoding,
+                quality=excluded.quality,
+                reason=excluded.reason,
+                created_at=datetime('now')
+        """, (prn, digest, source, b"" if enc is None else np.asarray(enc, dtype=np.float64).tobytes(),
+              quality, reason))
+        return digest, quality, reason
+
+    def enroll(self, prn, photo_bytes, conn=None):
+        """
+        Enroll a student's main photo: encode it once, grade it, and repack the
+        PRN's gallery encodings. Skips the encoder when the stored hash already
+        matches the photo; photo_bytes=None removes the PRN.
+        Returns True when the PRN has a usable encoding.
+        """
+        ensure_schema()
+        prn = str(prn).strip()
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+
+        try:
+            cur = conn.cursor()
+
+            if not photo_bytes:
+                cur.execute("DELETE FROM face_encodings WHERE prn=?", (prn,))
+                cur.execute("DELETE FROM face_templates WHERE prn=?", (prn,))
+                conn.commit()
+                self.mark_changed(prn)
+                return False
+
+            digest = photo_hash(photo_bytes)
+            cur.execute("SELECT photo_hash, length(encoding) FROM face_encodings WHERE prn=?", (prn,))
+            row = cur.fetchone()
+            if row and row[0] == digest:
+                return bool(row[1])
+
+            # the previous main photo is replaced, extra enrollment photos stay
+            cur.execute("DELETE FROM face_templates WHERE prn=? AND source='primary' AND photo_hash<>?",
+                        (prn, digest))
+            self._store_template(cur, prn, photo_bytes, "primary")
+            stored = _pack_templates(cur, prn, digest)
+            conn.commit()
+            self.mark_changed(prn)
+            return stored
+        finally:
+            if own_conn:
+                conn.close()
+
+    def enroll_photos(self, prn, photos, conn=None):
+        """
+        Add extra enrollment photos for a PRN. Each is graded; the best
+        TEMPLATES_PER_STUDENT accepted faces (main photo included) are kept for matching.
+        Returns [(quality, reason), ...] per photo, reason None when accepted.
+        """
+        ensure_schema()
+        prn = str(prn).strip()
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+
+        try:
+            cur = conn.cursor()
+            results = []
+            for photo_bytes in photos:
+                _, quality, reason = self._store_template(cur, prn, photo_bytes, "extra")
+                results.append((quality, reason))
+
+            cur.execute("SELECT photo_hash FROM face_encodings WHERE prn=?", (prn,))
+            row = cur.fetchone()
+            _pack_templates(cur, prn, row[0] if row else "")
+            conn.commit()
+            self.mark_changed(prn)
+            return results
+        finally:
+            if own_conn:
+                conn.close()
+
+    def backfill(self, progress=None):
+        """
+        Encode students whose photo has no stored encoding yet (one-time cost, run as
+        its own background job). A photo that cannot be encoded gets an empty marker
+        row, like a photo without a face, so it is not retried on every start.
+        progress(stage, info) receives ("backfill", {"done", "total"}) after each student.
+        Returns the number of students that got a usable encoding.
+        """
+        ensure_schema()
+        conn = get_connection()
+        conn.row_factory = sqlite3.Row
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT s.prn FROM students s
+            LEFT JOIN face_encodings f ON f.prn = s.prn
+            WHERE (length(s.photo) > 0 OR s.photo_ref IS NOT NULL) AND f.prn IS NULL
+        """)
+        missing = [r["prn"] for r in cur.fetchall()]
+
+        stored = 0
+        try:
+            for done, prn in enumerate(missing, 1):
+                data = None
+                try:
+                    cur.execute("SELECT photo, photo_ref FROM students WHERE prn=?", (prn,))
+                    row = cur.fetchone()
+                    data = image_store.load_bytes(row["photo"], row["photo_ref"]) if row else None
+                    if data and self.enroll(prn, data, conn=conn):
+                        stored += 1
+                except Exception as e:
+                    conn.rollback()
+                    tracing.count("enroll_failed")
+                    print(f"❌ Encoding failed for PRN {prn} → {e}")
+                    cur.execute("""
+                        INSERT INTO face_encodings(prn, photo_hash, encoding) VALUES (?, ?, X'')
+                        ON CONFLICT(prn) DO NOTHING
+                    """, (prn, photo_hash(data) if data else ""))
+                    conn.commit()
+                if progress:
+                    progress("backfill", {"done": done, "total": len(missing)})
+        finally:
+            conn.close()
+        tracing.count("backfilled", stored)
+        return stored
+
+    def mark_changed(self, prn):
+        """Queue one PRN so the next refresh re-reads only its row."""
+        with self._lock:
+            self._pending.add(str(prn).strip())
+
+    # ---------------- Cache ----------------
+    def _reset_locked(self, capacity=0):
+        self._buffer = np.empty((max(capacity, 64), ENCODING_DIM), dtype=np.float64)
+        self.keys = []
+        self._rows = {}
+        self._owner = {}
+        self._set_view_locked()
+
+    def _set_view_locked(self):
+        self.encodings = self._buffer[:len(self.keys)]
+
+    def _gallery_vectors(self, blob):
+        vecs = unpack_encodings(blob)
+        if self.gallery_mode == "centroid" and len(vecs) > 1:
+            return vecs.mean(axis=0, keepdims=True)
+        return vecs
+
+    def _append_rows_locked(self, prn, vecs):
+        start = len(self.keys)
+        need = start + len(vecs)
+        if need > len(self._buffer):
+            grown = np.empty((max(len(self._buffer) * 2, need), ENCODING_DIM), dtype=np.float64)
+            grown[:start] = self._buffer[:start]
+            self._buffer = grown
+        self._buffer[start:need] = vecs
+
+        rows = []
+        for k in range(len(vecs)):
+            key = prn if k == 0 else f"{prn}\x1f{k}"
+            if k:
+                self._owner[key] = prn
+            self.keys.append(key)
+            rows.append(start + k)
+        self._rows[prn] = rows
+        self._set_view_locked()
+
+    def _put_row_locked(self, prn, vecs):
+        """Replace one PRN's vectors in the packed matrix (amortised O(K))."""
+        self._drop_row_locked(prn)
+        self._append_rows_locked(prn, vecs)
+        if self.ann_index is not None:
+            for r in self._rows[prn]:
+                self.ann_index.add(self.keys[r], self._buffer[r])
+
+    def _drop_row_locked(self, prn):
+        """Remove one PRN's rows by moving the last rows into their slots."""
+        rows = self._rows.pop(prn, None)
+        if rows is None:
+            return
+
+        # highest first, so a row moved down never belongs to this PRN
+        for idx in sorted(rows, reverse=True):
+            key = self.keys[idx]
+            if self.ann_index is not None:
+                self.ann_index.remove(key)
+            self._owner.pop(key, None)
+
+            last = len(self.keys) - 1
+            if idx != last:
+                moved = self.keys[last]
+                self._buffer[idx] = self._buffer[last]
+                self.keys[idx] = moved
+                moved_rows = self._rows[self.owner(moved)]
+                moved_rows[moved_rows.index(last)] = idx
+            self.keys.pop()
+        self._set_view_locked()
+
+    def _sync_ann_index_locked(self, rebuild=False):
+        """
+        Keep an IVF index only for galleries big enough to need one. Centroids are
+        retrained only past face_index.IVF_RETRAIN_DRIFT; edits are saved on a
+        debounce (see flush_index) instead of rewriting the file on every refresh.
+        """
+        if len(self.keys) < face_index.IVF_MIN_GALLERY:
+            self.ann_index = None
+            return
+
+        trained = False
+        if self.ann_index is None or rebuild:
+            self.ann_index = IVFIndex.load(self.encodings, self.keys)
+        if self.ann_index is None or self.ann_index.drifted():
+            print(f"🧭 Training face index for {len(self.keys)} faces...")
+            self.ann_index = IVFIndex.train(self.encodings, self.keys)
+            trained = True
+
+        self._save_index_locked(force=trained)
+
+    def _save_index_locked(self, force=False):
+        index = self.ann_index
+        if index is None or not index.dirty:
+            return
+        now = time.monotonic()
+        if not force and self._index_saved_at is not None and \
+                now - self._index_saved_at < face_index.IVF_SAVE_INTERVAL_S:
+            return
+        try:
+            index.save()
+            self._index_saved_at = now
+        except Exception as e:
+            print(f"⚠ Could not persist face index → {e}")
+
+    def flush_index(self):
+        """Write pending index edits now; also runs at interpreter exit."""
+        with self._lock:
+            self._save_index_locked(force=True)
+
+    # ---------------- Load ----------------
+    def load(self, force=False):
+        """
+        force=True  → rebuild the whole cache from face_encodings.
+        force=False → incremental refresh (see refresh).
+        Returns the number of known students.
+        """
+        if not force:
+            return self.refresh()
+
+        with self._lock, tracing.trace("load", detector=self.detector.name) as t:
+            with tracing.span("read"):
+                conn = get_connection()
+                conn.row_factory = sqlite3.Row
+                cur = conn.cursor()
+                version = _change_window(cur)[1]
+                rows = _load_rows(cur)
+                # every process is at least this far along after a full load
+                cur.execute("DELETE FROM face_encoding_changes WHERE seq <= ?", (version - CHANGE_LOG_KEEP,))
+                conn.commit()
+                conn.close()
+
+                self._reset_locked(sum(len(r["encoding"]) for r in rows) // (8 * ENCODING_DIM))
+                for r in rows:
+                    self._append_rows_locked(str(r["prn"]).strip(), self._gallery_vectors(r["encoding"]))
+
+            with tracing.span("index"):
+                self._sync_ann_index_locked(rebuild=True)
+
+            self._pending.clear()
+            self._version = version
+            t.count("faces", len(self._rows))
+            t.count("templates", len(self.keys))
+
+            return len(self._rows)
+
+    def refresh(self):
+        """
+        Bring the cache up to date. Cost depends on what changed:
+        queued PRNs from mark_changed plus PRNs logged in face_encoding_changes
+        (by triggers, so writes from other processes count too) since the last sync.
+        """
+        if self._version is None:
+            return self.load(force=True)
+
+        with self._lock:
+            conn = get_connection()
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+
+            changed = set(self._pending)
+            self._pending.clear()
+
+            oldest, version = _change_window(cur)
+            if version != self._version:
+                if oldest is not None and oldest > self._version + 1:
+                    # log pruned past our watermark, so the diff is unknown
+                    conn.close()
+                    return self.load(force=True)
+                cur.execute("SELECT DISTINCT prn FROM face_encoding_changes WHERE seq > ?", (self._version,))
+                changed.update(str(r["prn"]).strip() for r in cur.fetchall())
+
+            if changed:
+                tracing.count("refreshed", len(changed))
+                rows = _load_rows(cur, changed)
+                found = {}
+                for r in rows:
+                    found[str(r["prn"]).strip()] = self._gallery_vectors(r["encoding"])
+                for prn in changed:
+                    if prn in found:
+                        self._put_row_locked(prn, found[prn])
+                    else:
+                        self._drop_row_locked(prn)
+                self._sync_ann_index_locked()
+
+            conn.close()
+            self._version = version
+            return len(self._rows)
+
+    # ---------------- Match ----------------
+    def gallery(self, prns=None):
+        """Index over the whole cache (prns=None) or over just the given PRNs. Call with the lock held."""
+        if prns is None:
+            return self.ann_index or BruteForceIndex(self.encodings, self.keys)
+        rows = np.array([r for p in prns for r in self._rows.get(p, ())], dtype=np.int64)
+        return BruteForceIndex(self.encodings[rows], [self.keys[r] for r in rows])
+
+    def match(self, face_encs, tolerance=0.50, scope=None, fallback=False):
+        """
+        Assign encodings to PRNs. scope limits the gallery to those PRNs;
+        fallback retries faces left unknown against everyone outside the scope.
+        Returns (present, unknown, conflicts, extra) where extra are the fallback matches.
+        """
+        # several rows per student can fill the candidate list, so look further
+        candidates = 5 * (TEMPLATES_PER_STUDENT if self.gallery_mode == "templates" else 1)
+
+        # Hold the lock while matching so a concurrent refresh can't move rows underneath us
+        with self._lock:
+            gallery = self.gallery(scope)
+            best_keys, _, conflicts = match_faces(face_encs, gallery, tolerance, candidates, owner=self.owner)
+            present = [k for k in best_keys if k is not None]
+            unknown = best_keys.count(None)
+            extra = []
+
+            if fallback and scope is not None and unknown:
+                missed = [i for i, k in enumerate(best_keys) if k is None]
+                in_scope = set(scope)
+                if self.ann_index is not None:
+                    wider, exclude = self.ann_index, in_scope
+                else:
+                    wider = self.gallery([p for p in self._rows if p not in in_scope])
+                    exclude = None
+                extra_keys, _, extra_conflicts = match_faces(
+                    [face_encs[i] for i in missed], wider, tolerance, candidates,
+                    exclude=exclude, owner=self.owner
+                )
+                extra = [k for k in extra_keys if k is not None]
+                unknown -= len(extra)
+                conflicts += extra_conflicts
+
+        return present, unknown, conflicts, extra
+
+    # ---------------- Recognize ----------------
+    def detect(self, img_np, strategy=None, timings=None):
+        """(locations, encodings) for every face in an RGB array."""
+        return detect_faces(img_np, strategy=strategy or self.strategy,
+                            detector=self.detector, encoder=self.encoder, timings=timings)
+
+    def recognize(self, image_bytes, tolerance=0.50, class_name=None, division=None, fallback=False,
+                  strategy=None, progress=None, timings=None):
+        """
+        class_name/division → match only against that roster (smaller search, fewer
+                              false positives from other sections)
+        fallback=True       → faces left unknown are retried against the rest of the school
+        strategy            → detection path (see utils/face_detection.detect_faces);
+                              None uses the engine default / photo size
+        progress(stage, info) → called after each stage ("decoded", "detected",
+                              "matched" with the PRNs found so far); may raise to abort
+        timings             → optional dict filled with seconds per stage
+
+        Returns:
+            present_prns (list[str])
+            unknown_count (int)
+        """
+
+        with tracing.trace("snap", detector=self.detector.name, class_name=class_name,
+                           division=division) as t:
+            # Only re-read students that changed since the last snap
+            with tracing.span("refresh"):
+                self.refresh()
+
+            if not self._rows:
+                print("⚠ No known student faces loaded")
+                return [], 0
+
+            scope = roster_prns(class_name, division) if class_name and division else None
+            report = progress or (lambda stage, info=None: None)
+            t.count("gallery", len(self._rows) if scope is None else len(scope))
+
+            timings = {} if timings is None else timings
+            t0 = time.perf_counter()
+            img_np = bytes_to_rgb_np(image_bytes)
+            timings["decode"] = time.perf_counter() - t0
+            t.attrs["size"] = list(img_np.shape[:2])
+            report("decoded", {"size": img_np.shape[:2]})
+
+            face_locs, face_encs = self.detect(img_np, strategy=strategy, timings=timings)
+            t.count("faces", len(face_encs))
+            report("detected", {"faces": len(face_encs)})
+
+            t0 = time.perf_counter()
+            present, unknown, conflicts, extra = self.match(face_encs, tolerance, scope, fallback)
+            report("matched", {"prns": [p for p in present]})
+            if fallback and scope is not None:
+                report("matched", {"prns": extra, "fallback": True})
+            present = present + extra
+            timings["match"] = time.perf_counter() - t0
+
+            for stage, secs in timings.items():
+                t.add(stage, secs)
+            t.count("matched", len(present))
+            t.count("unknown", unknown)
+            if extra:
+                t.count("fallback_matched", len(extra))
+            if conflicts:
+                t.count("conflicts", conflicts)
+
+            return present, unknown
@@ -0,0 +1,157 @@
+# utils/recognition_worker.py
+#
+# Background job runner for slow work (face recognition, attendance writes)
+# so the Tk main loop never blocks.
+#   - one worker thread, jobs run in submission order
+#   - callbacks (progress / done / error) are queued and run on the Tk thread
+#     by polling with widget.after, never called from the worker thread
+#   - jobs can be cancelled and have an optional timeout; cancellation is only
+#     observed before the job starts and at job.check()/job.report() — once the
+#     function has returned its result is delivered (a committed write is never
+#     reported as failed). Cancel jobs one by one: DB writes and exports should
+#     never be cancelled.
+
+import itertools
+import queue
+import threading
+import time
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobTimeout(JobCancelled):
+    pass
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, worker, fn, args, kwargs, on_progress, on_done, on_error, timeout):
+        self.id = next(Job._ids)
+        self.worker = worker
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.on_progress, self.on_done, self.on_error = on_progress, on_done, on_error
+        self.timeout = timeout
+        self.started_at = None
+        self.finished = False      # a final callback was delivered (Tk thread)
+        self.done = False          # fn returned or raised (worker thread)
+        self.lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._reason = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self, reason=None):
+        self._reason = reason or JobCancelled(f"Job {self.id} cancelled")
+        self._cancel.set()
+
+    def expired(self):
+        return bool(self.timeout and self.started_at and time.monotonic() - self.started_at > self.timeout)
+
+    def check(self):
+        """Called by the job between stages; raises if cancelled or out of time."""
+        if self.expired() and not self.cancelled:
+            self.cancel(JobTimeout(f"Job {self.id} exceeded {self.timeout}s"))
+        if self.cancelled:
+            raise self._reason
+
+    def report(self, stage, info=None):
+        """Progress hook for the job function; delivered to on_progress on the Tk thread."""
+        self.check()
+        if self.on_progress:
+            self.worker._post(self, self.on_progress, stage, info or {})
+
+
+class BackgroundWorker:
+    def __init__(self, widget, poll_ms=50):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self._jobs = queue.Queue()
+        self._outbox = queue.Queue()
+        self._active = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.widget.after(self.poll_ms, self._poll)
+
+    # ---------------- Public API ----------------
+    def submit(self, fn, *args, on_progress=None, on_done=None, on_error=None, timeout=None, **kwargs):
+        """Run fn(job, *args, **kwargs) on the worker thread. Returns the Job."""
+        job = Job(self, fn, args, kwargs, on_progress, on_done, on_error, timeout)
+        self._jobs.put(job)
+        return job
+
+    def shutdown(self):
+        """Stop delivering callbacks; jobs already queued still run, then the thread exits."""
+        self._stopped = True
+        self._jobs.put(None)
+
+    # ---------------- Worker Thread ----------------
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            if job.cancelled:
+                self._post(job, job.on_error, job._reason, final=True)
+                continue
+
+            self._active = job
+            job.started_at = time.monotonic()
+            try:
+                result = job.fn(job, *job.args, **job.kwargs)
+                outcome = (job.on_done, result)
+            except Exception as e:
+                outcome = (job.on_error, e)
+            # marked done before posting, so the watchdog can no longer time it out
+            with job.lock:
+                job.done = True
+            self._active = None
+            self._post(job, outcome[0], outcome[1], final=True)
+
+    def _post(self, job, callback, *args, final=False):
+        self._outbox.put((job, callback, args, final))
+
+    # ---------------- Tk Thread ----------------
+    def _poll(self):
+        if self._stopped:
+            return
+
+        # Timeout watchdog: report on the UI right away, the late result is dropped
+        active = self._active
+        if active and not active.finished and active.expired():
+            with active.lock:
+                timed_out = not active.done
+                if timed_out:
+                    active.finished = True
+                    active.cancel(JobTimeout(f"Job {active.id} exceeded {active.timeout}s"))
+            if timed_out and active.on_error:
+                self._safe_call(active.on_error, active._reason)
+
+        while True:
+            try:
+                job, callback, args, final = self._outbox.get_nowait()
+            except queue.Empty:
+                break
+            if job.finished:
+                continue
+            if final:
+                job.finished = True
+            if callback:
+                self._safe_call(callback, *args)
+
+        try:
+            self.widget.after(self.poll_ms, self._poll)
+        except Exception:
+            # widget destroyed
+            self.shutdown()
+
+    def _safe_call(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"❌ Worker callback failed → {e}")
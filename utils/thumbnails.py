@@ -0,0 +1,104 @@
+# utils/thumbnails.py
+#
+# Small JPEG renditions of student and group photos, made once at ingest and
+# cached in the thumbnails table (attendance.db, keyed like the image store:
+# "sha256:<hex>" of the full photo). UI paths read these; full-resolution
+# bytes are only loaded for recognition.
+#   avatar  → 120x120 centre crop (profile cards, student form)
+#   preview → fits in 280x280 (teacher dashboard group photo)
+#
+# A photo stored before thumbnails existed gets them on first view.
+
+import io
+
+from PIL import Image, ImageOps
+
+from utils.database import get_connection, ensure_schema
+from utils import image_store
+
+SIZES = {"avatar": 120, "preview": 280}
+JPEG_QUALITY = 85
+
+
+def render_all(data):
+    """{size name: JPEG bytes} for every size, from a single decode of the photo."""
+    img = Image.open(io.BytesIO(data))
+    # JPEG: let the decoder downscale by 1/2..1/8 instead of decoding every pixel
+    img.draft("RGB", (max(SIZES.values()) * 2,) * 2)
+    img = img.convert("RGB")
+
+    out = {}
+    for name, px in SIZES.items():
+        if name == "avatar":
+            thumb = ImageOps.fit(img, (px, px), Image.BILINEAR)
+        else:
+            thumb = img.copy()
+            thumb.thumbnail((px, px), Image.BILINEAR)
+        buf = io.BytesIO()
+        thumb.save(buf, "JPEG", quality=JPEG_QUALITY)
+        out[name] = buf.getvalue()
+    return out
+
+
+def _save(cur, ref, rendered):
+    cur.executemany(
+        "INSERT OR REPLACE INTO thumbnails(photo_ref, size, data) VALUES (?, ?, ?)",
+        [(ref, name, jpeg) for name, jpeg in rendered.items()]
+    )
+
+
+def store(data, cur=None, rendered=None):
+    """
+    Make and cache the thumbnails of a photo (skipped when already cached).
+    rendered: output of render_all for these bytes, if the caller already has it.
+    With cur the rows join the caller's transaction; otherwise they are committed here.
+    Returns the photo's reference key.
+    """
+    ref = image_store.make_ref(data)
+    own = cur is None
+    if own:
+        ensure_schema()
+        conn = get_connection()
+        cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM thumbnails WHERE photo_ref=?", (ref,))
+        if cur.fetchone()[0] < len(SIZES):
+            _save(cur, ref, rendered or render_all(data))
+            if own:
+                conn.commit()
+    finally:
+        if own:
+            conn.close()
+    return ref
+
+
+def load(key=None, size="avatar", full=None):
+    """
+    JPEG bytes of one thumbnail for the photo with this key ("sha256:<hex>").
+    On a cache miss full() supplies the full photo bytes, which are rendered once
+    and cached; without a key the key is computed from them.
+    Returns None when there is no photo.
+    """
+    if key:
+        ensure_schema()
+        conn = get_connection()
+        try:
+            row = conn.execute("SELECT data FROM thumbnails WHERE photo_ref=? AND size=?", (key, size)).fetchone()
+        finally:
+            conn.close()
+        if row:
+            return row[0]
+
+    data = full() if full else None
+    if not data:
+        return None
+    key = key or image_store.make_ref(bytes(data))
+    rendered = render_all(bytes(data))
+    ensure_schema()
+    conn = get_connection()
+    try:
+        _save(conn.cursor(), key, rendered)
+        conn.commit()
+    finally:
+        conn.close()
+    return rendered.get(size)
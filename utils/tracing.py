@@ -0,0 +1,227 @@
+# utils/tracing.py
+#
+# Lightweight tracing for the recognition path: one record per operation
+# (a snap, a cache load, an attendance save) instead of a print per step.
+#
+#   with tracing.trace("snap", class_name="MCA1") as t:
+#       with tracing.span("detect"):
+#           ...
+#       tracing.count("faces", 42)
+#
+# A record is {"trace", "id", "ts", "ms", "spans": {stage: ms}, "counters", "attrs",
+# "error"} and is handed to every sink when the trace closes. Spans/counters
+# outside an active trace are no-ops, so library code can call them freely.
+#
+# Sinks (SMARTSNAP_TRACE, comma separated, "" disables tracing output):
+#   ring     → last RING_SIZE records in memory (admin "Performance" page)
+#   jsonl    → logs/trace.jsonl next to attendance.db, rotated at JSONL_MAX_BYTES
+#   console  → one summary line per record
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from utils import database
+
+SINKS = os.environ.get("SMARTSNAP_TRACE", "ring,jsonl,console")
+RING_SIZE = 500
+JSONL_MAX_BYTES = 1024 * 1024
+JSONL_BACKUPS = 3
+
+_ids = itertools.count(1)
+_local = threading.local()
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.id = next(_ids)
+        self.attrs = dict(attrs)
+        self.spans = {}
+        self.counters = {}
+        self.error = None
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+
+    def add(self, stage, seconds):
+        """Accumulate seconds under a stage (repeated stages add up)."""
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self):
+        return {
+            "trace": self.name,
+            "id": self.id,
+            "ts": round(self.ts, 3),
+            "ms": round((time.perf_counter() - self.t0) * 1000.0, 2),
+            "spans": {k: round(v * 1000.0, 2) for k, v in self.spans.items()},
+            "counters": self.counters,
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+# ---------------- Sinks ----------------
+class RingBufferSink:
+    def __init__(self, capacity=RING_SIZE):
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def recent(self, limit=50, name=None):
+        out = [r for r in reversed(self.records) if name is None or r["trace"] == name]
+        return out[:limit]
+
+
+class JsonlSink:
+    def __init__(self, path=None, max_bytes=JSONL_MAX_BYTES, backups=JSONL_BACKUPS):
+        self.path = path or os.path.join(os.path.dirname(database.DB_PATH), "logs", "trace.jsonl")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def emit(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def recent(self, limit=50, name=None):
+        """Newest first, from the current file and then the backups (covers earlier sessions)."""
+        out = []
+        paths = [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]
+        for path in paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for line in reversed(lines):
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if name is None or rec.get("trace") == name:
+                    out.append(rec)
+                    if len(out) >= limit:
+                        return out
+        return out
+
+
+class ConsoleSink:
+    def emit(self, record):
+        stages = " | ".join(f"{k} {v:.0f}" for k, v in record["spans"].items())
+        counters = " ".join(f"{k}={v}" for k, v in record["counters"].items())
+        status = f" ❌ {record['error']}" if record["error"] else ""
+        print(f"⏱ {record['trace']} {record['ms']:.0f} ms [{stages}] {counters}{status}")
+
+
+_SINK_TYPES = {"ring": RingBufferSink, "jsonl": JsonlSink, "console": ConsoleSink}
+_sinks = None
+_sinks_lock = threading.Lock()
+
+
+def sinks():
+    global _sinks
+    with _sinks_lock:
+        if _sinks is None:
+            _sinks = [_SINK_TYPES[s.strip()]() for s in SINKS.split(",") if s.strip() in _SINK_TYPES]
+        return list(_sinks)
+
+
+def set_sinks(new_sinks):
+    """Replace all sinks (e.g. [RingBufferSink()] in tools that should not write files)."""
+    global _sinks
+    with _sinks_lock:
+        _sinks = list(new_sinks)
+
+
+def add_sink(sink):
+    """Add a sink next to the configured ones (any object with emit(record))."""
+    sinks()
+    with _sinks_lock:
+        _sinks.append(sink)
+
+
+def _emit(record):
+    for sink in sinks():
+        try:
+            sink.emit(record)
+        except Exception as e:
+            print(f"⚠ Trace sink {type(sink).__name__} failed → {e}")
+
+
+# ---------------- Recording ----------------
+def current():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Open a trace on this thread; nested traces are recorded separately."""
+    t = Trace(name, attrs)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(t)
+    try:
+        yield t
+    except BaseException as e:
+        t.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.pop()
+        _emit(t.record())
+
+
+@contextmanager
+def span(stage):
+    t = current()
+    if t is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(stage, time.perf_counter() - t0)
+
+
+def count(name, n=1):
+    t = current()
+    if t is not None:
+        t.count(name, n)
+
+
+def annotate(**attrs):
+    t = current()
+    if t is not None:
+        t.attrs.update(attrs)
+
+
+def recent(limit=50, name=None):
+    """Latest records, newest first, from the first sink that keeps history."""
+    for sink in sinks():
+        if hasattr(sink, "recent") and not isinstance(sink, RingBufferSink):
+            return sink.recent(limit, name)
+    for sink in sinks():
+        if hasattr(sink, "recent"):
+            return sink.recent(limit, name)
+    return []
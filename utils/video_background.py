@@ -0,0 +1,193 @@
+# utils/video_background.py
+#
+# Looping background video for a Tk label, cheap enough to leave running on a kiosk.
+#   - frames are decoded, colour-converted and scaled on a daemon thread into a
+#     small bounded queue (the thread blocks when the UI falls behind)
+#   - the Tk side pastes each frame into one reused PhotoImage; a new image is
+#     only created when the window size changes
+#   - scaling targets are recomputed on <Configure>, not per frame
+#   - low power: after IDLE_AFTER_S without mouse/keyboard input the video
+#     drops to IDLE_FPS (skipping frames with grab()), or freezes on the
+#     current frame with LOW_POWER_MODE = "still"; any input restores full rate
+#   - decoding stops entirely while the label is not mapped
+
+import queue
+import threading
+import time
+
+import cv2
+from PIL import Image, ImageTk
+
+MAX_FPS = 30
+FRAME_QUEUE = 3
+IDLE_AFTER_S = 60
+IDLE_FPS = 5
+# "slow" → IDLE_FPS while idle, "still" → freeze on the last frame, None → never throttle
+LOW_POWER_MODE = "slow"
+
+# Last mouse/keyboard input per toplevel; bound once so repeated start/stop never stacks bindings
+_last_input = {}
+
+
+def _track_input(toplevel):
+    key = str(toplevel)
+    if key not in _last_input:
+        _last_input[key] = time.monotonic()
+        for seq in ("<Motion>", "<KeyPress>", "<ButtonPress>"):
+            toplevel.bind_all(seq, lambda e, k=key: _last_input.__setitem__(k, time.monotonic()), add="+")
+    return key
+
+
+class VideoBackground:
+    def __init__(self, label, path, low_power=LOW_POWER_MODE):
+        self.label = label
+        self.path = path
+        self.low_power = low_power
+
+        self.cap = None
+        self.video_fps = MAX_FPS
+        self.frames = queue.Queue(maxsize=FRAME_QUEUE)
+        self.photo = None
+        self.size = (0, 0)            # target (w, h); written on the Tk thread, read by the decoder
+        self.skip = 0                 # frames to grab() without decoding per shown frame
+        self.idle = False
+
+        self._stop = threading.Event()
+        self._awake = threading.Event()
+        self._thread = None
+        self._after_id = None
+        self._input_key = None
+
+    # ---------------- Public API ----------------
+    def start(self):
+        """Open the video; returns False if it cannot be read."""
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            self.cap = None
+            return False
+
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or MAX_FPS
+        self.video_fps = min(fps, MAX_FPS) if fps > 0 else MAX_FPS
+        self._on_resize()
+        self._awake.set()
+
+        # replaces (not adds to) the label's handlers, so a restarted renderer takes them over
+        self.label.bind("<Configure>", lambda e: self._on_resize())
+        self.label.bind("<Map>", lambda e: self._on_map())
+        self.label.bind("<Unmap>", lambda e: self._awake.clear())
+        self._input_key = _track_input(self.label.winfo_toplevel())
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
+        self._tick()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._awake.set()
+        if self._after_id:
+            try:
+                self.label.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        # unblock a decoder waiting on a full queue
+        while not self.frames.empty():
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    # ---------------- Decoder Thread ----------------
+    def _decode_loop(self):
+        cap = self.cap
+        try:
+            while not self._stop.is_set():
+                if not self._awake.wait(timeout=0.5):
+                    continue
+                if self._stop.is_set():
+                    break
+
+                for _ in range(self.skip):
+                    if not cap.grab():
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = cap.read()
+                if not ok:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ok, frame = cap.read()
+                    if not ok:
+                        time.sleep(0.05)
+                        continue
+
+                w, h = self.size
+                if w < 50 or h < 50:
+                    time.sleep(0.05)
+                    continue
+                if (frame.shape[1], frame.shape[0]) != (w, h):
+                    frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_LINEAR)
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+                while not self._stop.is_set():
+                    try:
+                        self.frames.put(frame, timeout=0.25)
+                        break
+                    except queue.Full:
+                        continue
+        finally:
+            cap.release()
+
+    # ---------------- Tk Thread ----------------
+    def _on_resize(self):
+        size = (self.label.winfo_width(), self.label.winfo_height())
+        if size != self.size:
+            self.size = size
+
+    def _on_map(self):
+        if not (self.idle and self.low_power == "still"):
+            self._awake.set()
+
+    def _is_idle(self):
+        last = _last_input.get(self._input_key, time.monotonic())
+        return self.low_power is not None and time.monotonic() - last > IDLE_AFTER_S
+
+    def _tick(self):
+        if self._stop.is_set():
+            return
+
+        fps = self.video_fps
+        idle = self._is_idle()
+        if idle != self.idle:
+            self.idle = idle
+            if not idle:
+                self.skip = 0
+                self._awake.set()
+            elif self.low_power == "still":
+                self._awake.clear()
+            else:
+                self.skip = max(0, int(round(self.video_fps / IDLE_FPS)) - 1)
+        if idle and self.low_power != "still":
+            fps = min(IDLE_FPS, self.video_fps)
+        elif not self._awake.is_set():
+            # frozen or hidden: just poll for input now and then
+            fps = 4
+
+        try:
+            frame = self.frames.get_nowait()
+        except queue.Empty:
+            frame = None
+
+        if frame is not None:
+            h, w = frame.shape[:2]
+            img = Image.fromarray(frame)
+            if self.photo is None or (self.photo.width(), self.photo.height()) != (w, h):
+                self.photo = ImageTk.PhotoImage(img)
+                self.label.configure(image=self.photo)
+                self.label.image = self.photo
+            else:
+                self.photo.paste(img)
+
+        self._after_id = self.label.after(int(1000 / fps), self._tick)